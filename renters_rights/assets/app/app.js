@@ -53,4 +53,19 @@ export function copyTextToClipboard(x) {
     }, function(err) {
         console.error('Async: Could not copy text: ', err);
     });
-}
\ No newline at end of file
+}
+
+// Cached pages can't include a CSRF token, so their forms fetch one from data-csrf-token-url when they're submitted.
+export function submitWithCsrfToken(form) {
+    fetch(form.dataset.csrfTokenUrl, {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+            let input = document.createElement('input');
+            input.type = 'hidden';
+            input.name = 'csrfmiddlewaretoken';
+            input.value = data.token;
+            form.appendChild(input);
+            form.submit();
+        });
+    return false;
+}
@@ -4,4 +4,9 @@ echo "Waiting for database to start"
 ./wait-for-it.sh db:5432 --timeout=60 -- echo "Postgres is up"
 
 echo "Starting server"
-./manage.py runserver 0.0.0.0:80
\ No newline at end of file
+if [ "$DJANGO_SETTINGS_MODULE" = "renters_rights.settings.local" ]; then
+  # Reloads when the code changes.
+  ./manage.py runserver 0.0.0.0:80
+else
+  exec gunicorn --config gunicorn.conf.py
+fi
@@ -1,12 +1,20 @@
+import difflib
 import glob
 import os
-import re
+import tempfile
+import time
 
 import django
 import yaml
 from django.apps import apps
 from django.conf import settings
 
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
+
 django.setup()
 
 STRINGS_FILE_NAME = "fix_strings.yaml"
@@ -17,36 +25,80 @@ fixtures_dir = os.path.join(app_config.path, "fixtures")
 
 language_code = settings.LANGUAGE_CODE
 translated_language_codes = [tl[0] for tl in settings.LANGUAGES if tl[0] != language_code]
-translated_language_keys_re = re.compile("|".join([f"^(.*)_{tl}$" for tl in translated_language_codes]))
+
+
+class Fixture:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "r") as fixture_file:
+            self.text = fixture_file.read()
+        self.objects = yaml.load(self.text, Loader=SafeLoader) or []
+        self.changed = False
+
+    def dump(self):
+        return yaml.dump(self.objects, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+
+    def write(self):
+        """Writes the fixture to a temporary file and then moves it into place, so it's never left half-written."""
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as temp_file:
+                temp_file.write(self.dump())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def diff(self):
+        return difflib.unified_diff(
+            self.text.splitlines(keepends=True), self.dump().splitlines(keepends=True), self.path, f"{self.path} (translated)"
+        )
+
+
+def load_fixtures():
+    fixtures = []
+    for fixture_path in sorted(glob.glob(os.path.join(fixtures_dir, "*.yaml"))):
+        fixture = Fixture(fixture_path)
+        if fixture.objects:
+            print(f"Found fixture at: {fixture_path}")
+            fixtures.append(fixture)
+    return fixtures
+
+
+def build_key_index(fixtures):
+    """Indexes the translatable fields of every fixture object.
+
+    Returns: a dict of (fixture, fields, field name) tuples by `model.pk.field` string key.
+    """
+    index = {}
+    for fixture in fixtures:
+        for o in fixture.objects:
+            for k in o["fields"]:
+                field_name, _, lc = k.rpartition("_")
+                if lc in translated_language_codes:
+                    index.setdefault(f"{o['model']}.{o['pk']}.{field_name}", (fixture, o["fields"], field_name))
+    return index
 
 
 def export_strings():
     print("Exporting fixture strings for translation")
+    start = time.perf_counter()
     output = {language_code: {}}
 
-    for fixture_path in glob.glob(os.path.join(fixtures_dir, "*.yaml")):
-        with open(fixture_path, "r+") as fixture_file:
-            fixture = yaml.safe_load(fixture_file)
-            if not fixture:
-                continue
-            print(f"Found fixture at: {fixture_path}")
-
-            for o in fixture:
-                for k, v in o["fields"].items():
-                    if (match := translated_language_keys_re.match(k)) is not None:
-                        orig_key = f"{match.group(1)}_{language_code}"
-                        orig_value = o["fields"][orig_key]
-                        if orig_value:
-                            output[language_code][f"{o['model']}.{o['pk']}.{match.group(1)}"] = orig_value
+    for string_key, (_, fields, field_name) in build_key_index(load_fixtures()).items():
+        orig_value = fields[f"{field_name}_{language_code}"]
+        if orig_value:
+            output[language_code][string_key] = orig_value
 
     output_path = os.path.join(settings.LOCALE_PATHS[0], language_code, STRINGS_FILE_NAME)
     with open(output_path, "w") as output_file:
         print(f"Exporting strings to: {output_path}")
         yaml.dump(output, output_file)
+    print(f"Exported {len(output[language_code])} strings in {time.perf_counter() - start:.2f}s")
 
 
-def import_translations():
-    print("Importing fixture translations")
+def load_translated_strings():
+    translated_strings = {}
     for lc in translated_language_codes:
         print(f"Looking for {lc} translations")
         translated_strings_path = os.path.join(settings.LOCALE_PATHS[0], lc, STRINGS_FILE_NAME)
@@ -55,23 +107,37 @@ def import_translations():
 
         print(f"Found {lc} translations")
         with open(translated_strings_path, "r") as translated_strings_file:
-            translated_strings = yaml.safe_load(translated_strings_file)[language_code]
-            for fixture_path in glob.glob(os.path.join(fixtures_dir, "*.yaml")):
-                with open(fixture_path, "r+") as fixture_file:
-                    fixture = yaml.safe_load(fixture_file)
-                    if not fixture:
-                        continue
-                    print(f"Found fixture at: {fixture_path}")
-                    for o in fixture:
-                        for k, v in o["fields"].items():
-                            if (match := translated_language_keys_re.match(k)) is not None:
-                                string_key = f"{o['model']}.{o['pk']}.{match.group(1)}"
-                                if string_key in translated_strings and translated_strings[string_key]:
-                                    print(f"Updating {string_key}")
-                                    o["fields"][k] = translated_strings[string_key]
-                    print(f"Updating fixture")
-                    fixture_file.seek(0)
-                    yaml.dump(fixture, fixture_file)
+            translated_strings[lc] = yaml.load(translated_strings_file, Loader=SafeLoader)[language_code]
+    return translated_strings
+
+
+def import_translations(dry_run=False):
+    print("Importing fixture translations")
+    start = time.perf_counter()
+    translated_strings = load_translated_strings()
+    fixtures = load_fixtures()
+
+    updated = 0
+    for string_key, (fixture, fields, field_name) in build_key_index(fixtures).items():
+        for lc, strings in translated_strings.items():
+            translated_value = strings.get(string_key)
+            translated_key = f"{field_name}_{lc}"
+            if translated_value and fields[translated_key] != translated_value:
+                print(f"Updating {string_key} ({lc})")
+                fields[translated_key] = translated_value
+                fixture.changed = True
+                updated += 1
+
+    for fixture in fixtures:
+        if not fixture.changed:
+            continue
+        if dry_run:
+            print("".join(fixture.diff()))
+        else:
+            print(f"Updating fixture at: {fixture.path}")
+            fixture.write()
+
+    print(f"{'Found' if dry_run else 'Imported'} {updated} translations in {time.perf_counter() - start:.2f}s")
 
 
 if __name__ == "__main__":
@@ -83,9 +149,10 @@ if __name__ == "__main__":
         "--export", action="store_true", help="Export strings from fixture files to be uploaded to translation service."
     )
     group.add_argument("--import", action="store_true", help="Import translations from translation setvice into fixture files.")
+    parser.add_argument("--dry-run", action="store_true", help="Show the changes an import would make without making them.")
     args = parser.parse_args()
 
     if args.export:
         export_strings()
     else:
-        import_translations()
+        import_translations(dry_run=args.dry_run)
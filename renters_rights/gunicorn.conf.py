@@ -0,0 +1,92 @@
+"""Gunicorn settings, used by the web process in production and by the Docker entrypoint.
+
+Every setting can be overridden from the environment:
+  WEB_CONCURRENCY: worker processes. Defaults to as many as fit in the container's memory, up to two per CPU (plus one).
+  GUNICORN_THREADS: threads per worker. More than one uses threaded workers, which keep serving while a thread waits on
+    the database or cache, without the memory of another process.
+  GUNICORN_WORKER_MEMORY_MB: how much memory to allow each worker when working out WEB_CONCURRENCY.
+  GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER: restart a worker after this many requests (plus up to the
+    jitter, so workers don't all restart at once), to keep any slow memory growth in check.
+  GUNICORN_KEEPALIVE: seconds to hold a connection open for the next request from the router.
+  GUNICORN_LOG_LEVEL: how much gunicorn logs.
+  GUNICORN_ASGI: serve renters_rights.asgi with uvicorn workers instead. The public pages are async views, so a slow
+    client doesn't hold a thread while its page is sent; GUNICORN_THREADS doesn't apply. Persistent database
+    connections aren't closed by the threads that sync views run in under ASGI, so DB_CONN_MAX_AGE must be 0 (the
+    default when this is set).
+
+Remember that each thread of each worker can hold its own database connection (see DB_CONN_MAX_AGE), so
+WEB_CONCURRENCY * GUNICORN_THREADS per dyno has to fit in the database's connection limit.
+"""
+
+import multiprocessing
+import os
+
+# Heroku kills requests after 30 seconds, so a worker stuck for longer than that is restarted.
+REQUEST_TIMEOUT = 30
+
+
+def get_env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def get_memory_limit():
+    """Returns: the container's memory limit in bytes, from cgroups, or the machine's memory if it isn't limited."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                limit = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v2 says "max" when there's no limit; v1 reports a huge number.
+        if limit.isdigit() and int(limit) < 2**60:
+            return int(limit)
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def get_workers():
+    cpu_workers = multiprocessing.cpu_count() * 2 + 1
+    memory_workers = get_memory_limit() // (get_env_int("GUNICORN_WORKER_MEMORY_MB", 256) * 1024 * 1024)
+    return get_env_int("WEB_CONCURRENCY", max(1, min(cpu_workers, memory_workers)))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+workers = get_workers()
+threads = get_env_int("GUNICORN_THREADS", 4)
+if os.environ.get("GUNICORN_ASGI", "").lower() in ("yes", "true", "t", "1"):
+    # Each request can run its sync code in a different thread, and a connection kept open in one of them is never
+    # closed or reused, so they pile up until the database refuses new ones.
+    if get_env_int("DB_CONN_MAX_AGE", 0):
+        raise RuntimeError("DB_CONN_MAX_AGE must be 0 when GUNICORN_ASGI is set.")
+    # Set before the app is preloaded, so the settings pick it up.
+    os.environ["DB_CONN_MAX_AGE"] = "0"
+    wsgi_app = "renters_rights.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "renters_rights.wsgi:application"
+    worker_class = "gthread" if threads > 1 else "sync"
+
+max_requests = get_env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = get_env_int("GUNICORN_MAX_REQUESTS_JITTER", 100)
+
+# Load the app before forking, so workers start faster and share its memory until they write to it.
+preload_app = True
+
+keepalive = get_env_int("GUNICORN_KEEPALIVE", 5)
+timeout = REQUEST_TIMEOUT
+graceful_timeout = REQUEST_TIMEOUT
+
+# Docker's /tmp can be on a slow overlay filesystem, which makes worker heartbeats block.
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    from django.db import connections
+
+    # Connections opened while preloading the app mustn't be shared between processes.
+    connections.close_all()
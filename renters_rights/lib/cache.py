@@ -0,0 +1,242 @@
+import pickle
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+# How many idle memcached clients each process keeps, by default.
+DEFAULT_POOL_SIZE = 8
+
+_MISSING = object()
+
+_pools = {}
+_local_caches = {}
+_lock = threading.Lock()
+
+
+class ClientPool:
+    """Idle memcached clients, shared by every thread in the process, so connections (and their SASL logins) outlive the
+    request and thread that opened them.
+
+    Args:
+      create_client: a function that returns a new client.
+      max_size: how many idle clients to keep. Clients returned to a full pool are disconnected.
+    """
+
+    def __init__(self, create_client, max_size):
+        self.create_client = create_client
+        self.idle = queue.LifoQueue(max_size)
+
+    @contextmanager
+    def client(self):
+        try:
+            client = self.idle.get_nowait()
+        except queue.Empty:
+            client = self.create_client()
+
+        try:
+            yield client
+        except Exception:
+            # The connection may be half way through a response, so it can't be reused.
+            client.disconnect_all()
+            raise
+
+        try:
+            self.idle.put_nowait(client)
+        except queue.Full:
+            client.disconnect_all()
+
+
+class PooledClient:
+    """Stands in for a memcached client, running each call on a client borrowed from a ClientPool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            with self.pool.client() as client:
+                return getattr(client, name)(*args, **kwargs)
+
+        return call
+
+
+class PooledMemcachedMixin:
+    """Makes a Django memcached backend share its connections between threads and requests through a ClientPool, rather
+    than every thread opening its own and closing them at the end of each request.
+
+    OPTIONS can include POOL_SIZE, the number of idle clients to keep. The rest are passed to the client.
+    """
+
+    def __init__(self, server, params, *args, **kwargs):
+        options = dict(params.get("OPTIONS") or {})
+        self.pool_size = options.pop("POOL_SIZE", DEFAULT_POOL_SIZE)
+        super().__init__(server, {**params, "OPTIONS": options}, *args, **kwargs)
+
+    @cached_property
+    def _cache(self):
+        key = (self._class, tuple(self.client_servers), repr(sorted(self._options.items())))
+        with _lock:
+            if key not in _pools:
+                _pools[key] = ClientPool(lambda: self._class(self.client_servers, **self._options), self.pool_size)
+            return PooledClient(_pools[key])
+
+    def close(self, **kwargs):
+        # Connections go back to the pool after every call, so there's nothing to close at the end of a request.
+        pass
+
+
+class LocalCache:
+    """A thread-safe LRU of values that expire after a few seconds, shared by every thread in the process.
+
+    Values are pickled, like in Django's local memory cache, so callers can't change each other's copies.
+
+    Args:
+      max_entries: how many values to keep. The least recently used value is dropped to make room for a new one.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return default
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def get_local_cache(name, max_entries):
+    with _lock:
+        if name not in _local_caches:
+            _local_caches[name] = LocalCache(max_entries)
+        return _local_caches[name]
+
+
+def clear_pools():
+    with _lock:
+        _pools.clear()
+        _local_caches.clear()
+
+
+class TieredCache(BaseCache):
+    """A cache backend that keeps recently used values in process memory in front of a shared cache (LOCATION is the
+    shared cache's alias), so hot keys like the content version and cached pages don't need a round trip at all.
+
+    Values are only kept locally for LOCAL_TIMEOUT seconds (5 by default), which is also how long another process's
+    change can take to be seen here. Up to LOCAL_MAX_ENTRIES (1000 by default) values are kept. Atomic operations (add,
+    incr and decr) always go to the shared cache.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS") or {}
+        self.shared_alias = location
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 5)
+        self.local = get_local_cache(location, options.get("LOCAL_MAX_ENTRIES", 1000))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def set_local(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_timeout = self.local_timeout
+        if timeout not in (DEFAULT_TIMEOUT, None):
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout > 0:
+            self.local.set(self.make_key(key, version), value, local_timeout)
+        else:
+            self.local.delete(self.make_key(key, version))
+
+    def get(self, key, default=None, version=None):
+        value = self.local.get(self.make_key(key, version), _MISSING)
+        if value is _MISSING:
+            value = self.shared.get(key, _MISSING, version)
+            if value is _MISSING:
+                return default
+            self.set_local(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        values = {}
+        for key in keys:
+            value = self.local.get(self.make_key(key, version), _MISSING)
+            if value is not _MISSING:
+                values[key] = value
+
+        missing = [key for key in keys if key not in values]
+        if missing:
+            # Fetched from the shared cache in one round trip.
+            for key, value in self.shared.get_many(missing, version).items():
+                self.set_local(key, value, version=version)
+                values[key] = value
+        return values
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self.set_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed_keys = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            if key not in failed_keys:
+                self.set_local(key, value, timeout, version)
+        return failed_keys
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self.set_local(key, value, timeout, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.incr(key, delta, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.delete(self.make_key(key, version))
+        self.shared.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.local.get(self.make_key(key, version), _MISSING) is not _MISSING or self.shared.has_key(key, version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
@@ -0,0 +1,150 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+_state = Local()
+# When the replica last failed to connect, so it isn't retried on every query while it's down.
+_replica_failed_at = None
+
+
+def replica_alias():
+    return getattr(settings, "DATABASE_REPLICA", "replica")
+
+
+def replica_configured():
+    return replica_alias() in settings.DATABASES
+
+
+def replica_available():
+    """Checks the replica can be connected to. After a failure, the replica isn't tried again for
+    DATABASE_REPLICA_RETRY_SECONDS, and reads go to the primary database in the meantime.
+
+    Returns: True if reads can be sent to the replica, otherwise False.
+    """
+    global _replica_failed_at
+    if not replica_configured():
+        return False
+    if _replica_failed_at is not None and time.monotonic() - _replica_failed_at < settings.DATABASE_REPLICA_RETRY_SECONDS:
+        return False
+
+    try:
+        connections[replica_alias()].ensure_connection()
+    except OperationalError:
+        logger.warning("Couldn't connect to the replica database, reading from the primary", exc_info=True)
+        _replica_failed_at = time.monotonic()
+        return False
+    _replica_failed_at = None
+    return True
+
+
+@contextmanager
+def use_replica():
+    """Sends reads inside the block to the replica database, if there is one."""
+    previous = getattr(_state, "use_replica", False)
+    _state.use_replica = True
+    try:
+        yield
+    finally:
+        _state.use_replica = previous
+
+
+@contextmanager
+def use_primary():
+    """Sends reads inside the block to the primary database.
+
+    Anything cached until the content next changes, like pages keyed on the content version, has to be built inside it.
+    Otherwise a replica that's behind could fill the cache with content older than the version it's stored under, and
+    nothing would ever replace it.
+    """
+    previous = getattr(_state, "use_primary", False)
+    _state.use_primary = True
+    try:
+        yield
+    finally:
+        _state.use_primary = previous
+
+
+def replica_reads(view_func):
+    """Decorates a read-only view so its queries go to the replica database, if there is one."""
+
+    @functools.wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        with use_replica():
+            return view_func(*args, **kwargs)
+
+    return wrapped_view
+
+
+def pin_to_primary():
+    """Sends every read for the rest of the request to the primary database, so they see what it has just written."""
+    _state.pinned = True
+
+
+def pinned_to_primary():
+    return getattr(_state, "pinned", False)
+
+
+def wrote_to_primary():
+    """Returns: True if anything has been written to the database during this request, even if it was already pinned."""
+    return getattr(_state, "wrote", False)
+
+
+@contextmanager
+def route_request(replica=False, pinned=False):
+    """Sets how reads are routed for one request. Outside of this, only reads inside `use_replica` go to the replica.
+
+    Args:
+      replica: send every read to the replica, not only reads of DATABASE_REPLICA_APPS.
+      pinned: send every read to the primary database.
+    """
+    previous = getattr(_state, "in_request", False), getattr(_state, "use_replica", False), pinned_to_primary()
+    previous_wrote = wrote_to_primary()
+    _state.in_request, _state.use_replica, _state.pinned, _state.wrote = True, replica, pinned, False
+    try:
+        yield
+    finally:
+        _state.in_request, _state.use_replica, _state.pinned = previous
+        _state.wrote = previous_wrote
+
+
+class ReplicaRouter:
+    """Sends reads to the replica database when there is one and it's up.
+
+    Within a request (see `route_request`), reads of the public content (DATABASE_REPLICA_APPS) go to the replica, as do
+    all reads made inside `use_replica`, apart from DATABASE_PRIMARY_APPS (like users and sessions), which always read
+    from the primary. Once a request writes anything, the rest of its reads go to the primary, so it never reads data
+    older than its own writes. Reads inside `use_primary`, and outside of requests (like in management commands), go to
+    the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        if pinned_to_primary() or getattr(_state, "use_primary", False) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        app_label = model._meta.app_label
+        if app_label in settings.DATABASE_PRIMARY_APPS:
+            return None
+        if getattr(_state, "use_replica", False):
+            return replica_alias() if replica_available() else None
+        if app_label in settings.DATABASE_REPLICA_APPS and getattr(_state, "in_request", False):
+            return replica_alias() if replica_available() else None
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        pin_to_primary()
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as the default database.
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db != replica_alias()
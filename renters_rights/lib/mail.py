@@ -0,0 +1,134 @@
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail.backends import smtp
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_POOL_MAX_IDLE_SECONDS = 60
+DEFAULT_MAX_MESSAGES_PER_CONNECTION = 100
+
+# Idle, authenticated SMTP connections by (host, port, username, use_tls, use_ssl). Each entry is a
+# (connection, messages sent, time returned) tuple; the most recently returned connection is reused first.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _close_quietly(connection):
+    try:
+        connection.close()
+    except (OSError, smtplib.SMTPException):
+        pass
+
+
+def _is_healthy(connection, returned_at):
+    """Checks that a pooled connection hasn't idled out and that the server still answers on it."""
+    if time.monotonic() - returned_at > getattr(settings, "EMAIL_POOL_MAX_IDLE_SECONDS", DEFAULT_POOL_MAX_IDLE_SECONDS):
+        return False
+    try:
+        return connection.noop()[0] == 250
+    except (OSError, smtplib.SMTPException):
+        return False
+
+
+def clear_pools():
+    """Closes every pooled connection."""
+    with _pools_lock:
+        entries = [entry for pool in _pools.values() for entry in pool]
+        _pools.clear()
+    for connection, _, _ in entries:
+        _close_quietly(connection)
+
+
+class PooledEmailBackend(smtp.EmailBackend):
+    """An SMTP email backend that keeps authenticated connections open between uses.
+
+    Closing the backend returns its connection to a small per-process pool instead of quitting, and opening it takes a
+    connection from the pool after checking it with NOOP, so most sends skip the TCP, TLS and AUTH handshakes. A
+    connection that drops mid-send is replaced and the message retried once. Connections are recycled after
+    `EMAIL_MAX_MESSAGES_PER_CONNECTION` messages, since many relays limit how much can be sent per session.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent_on_connection = 0
+
+    @property
+    def pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def _checkout(self):
+        while True:
+            with _pools_lock:
+                pool = _pools.get(self.pool_key)
+                if not pool:
+                    return None
+                connection, sent, returned_at = pool.pop()
+            if _is_healthy(connection, returned_at):
+                self.connection, self.sent_on_connection = connection, sent
+                return connection
+            _close_quietly(connection)
+
+    def _checkin(self):
+        with _pools_lock:
+            pool = _pools.setdefault(self.pool_key, [])
+            if len(pool) >= getattr(settings, "EMAIL_POOL_SIZE", DEFAULT_POOL_SIZE):
+                return False
+            pool.append((self.connection, self.sent_on_connection, time.monotonic()))
+        self.connection = None
+        return True
+
+    def _reconnect(self):
+        self._discard()
+        return super().open()
+
+    def _discard(self):
+        if self.connection is not None:
+            _close_quietly(self.connection)
+            self.connection = None
+
+    def open(self):
+        if self.connection:
+            return False
+        if self._checkout():
+            return True
+        self.sent_on_connection = 0
+        return super().open()
+
+    def close(self):
+        if self.connection is None:
+            return
+        max_messages = getattr(settings, "EMAIL_MAX_MESSAGES_PER_CONNECTION", DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+        if self.sent_on_connection < max_messages and self._checkin():
+            return
+        super().close()
+
+    def _send(self, email_message):
+        max_messages = getattr(settings, "EMAIL_MAX_MESSAGES_PER_CONNECTION", DEFAULT_MAX_MESSAGES_PER_CONNECTION)
+        if self.sent_on_connection >= max_messages:
+            super().close()
+            if not self._reconnect():
+                return False
+            self.sent_on_connection = 0
+
+        fail_silently, self.fail_silently = self.fail_silently, False
+        try:
+            sent = super()._send(email_message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The server dropped the connection. Reconnect and try once more, failing however the caller asked.
+            self.fail_silently = fail_silently
+            if not self._reconnect():
+                return False
+            self.sent_on_connection = 0
+            sent = super()._send(email_message)
+        except smtplib.SMTPException:
+            if not fail_silently:
+                raise
+            sent = False
+        finally:
+            self.fail_silently = fail_silently
+
+        if sent:
+            self.sent_on_connection += 1
+        return sent
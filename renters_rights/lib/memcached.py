@@ -0,0 +1,7 @@
+from django_bmemcached.memcached import BMemcached
+
+from lib.cache import PooledMemcachedMixin
+
+
+class PooledBMemcached(PooledMemcachedMixin, BMemcached):
+    """django_bmemcached's backend, with connections shared by every thread in the process (see PooledMemcachedMixin)."""
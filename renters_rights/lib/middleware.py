@@ -1,29 +1,197 @@
 import base64
+import binascii
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.conf import settings
+from django.db import connections
 from django.http import HttpResponse
 
+from lib.db import route_request, wrote_to_primary
+
+logger = logging.getLogger(__name__)
+
+# Set for a few seconds after a request writes to the database, so the requests that follow read from the primary.
+REPLICA_PIN_COOKIE = "_pin_primary"
+
+# How many validated Authorization headers to remember.
+BASIC_AUTH_CACHE_SIZE = 32
+
+
+class AsyncCapableMiddleware:
+    """A base for middleware that runs natively under both WSGI and ASGI, so Django doesn't have to pass async requests
+    through a thread to run it.
+
+    Subclasses implement `process_request`, which can return a response to skip the view, and `process_response`.
+    Both are called from the event loop under ASGI, so they mustn't do blocking IO (like querying the database).
+    """
+
+    sync_capable = True
+    async_capable = True
 
-class BasicAuthMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def process_request(self, request):
+        return None
+
+    def process_response(self, request, response):
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+
+class BasicAuthMiddleware(AsyncCapableMiddleware):
+    """Requires HTTP basic auth with BASIC_AUTH_USERNAME and BASIC_AUTH_PASSWORD for every request, apart from static files
+    and the paths in BASIC_AUTH_EXEMPT_PATHS (like health checks).
+
+    Credentials are compared in constant time, and the last few headers that passed are remembered, so most requests
+    skip decoding the header altogether.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.valid_headers = OrderedDict()
+        self.lock = threading.Lock()
 
     def unauthorized(self):
         response = HttpResponse("Unauthorized", status=401)
         response["WWW-Authenticate"] = f'Basic realm="{settings.SITE_NAME} App"'
         return response
 
-    def __call__(self, request):
-        if "HTTP_AUTHORIZATION" in request.META and (settings.BASIC_AUTH_USERNAME and settings.BASIC_AUTH_PASSWORD):
-            authentication = request.META["HTTP_AUTHORIZATION"]
-            (method, auth) = authentication.split(" ", 1)
+    def is_exempt(self, path):
+        exempt_paths = [settings.STATIC_URL, *getattr(settings, "BASIC_AUTH_EXEMPT_PATHS", [])]
+        return any(path.startswith(exempt_path) for exempt_path in exempt_paths if exempt_path)
+
+    def is_authorized(self, authorization):
+        """Checks an Authorization header against the configured credentials.
+
+        Returns: True if the header has the right username and password, otherwise False.
+        """
+        key = (authorization, settings.BASIC_AUTH_USERNAME, settings.BASIC_AUTH_PASSWORD)
+        with self.lock:
+            if key in self.valid_headers:
+                self.valid_headers.move_to_end(key)
+                return True
+
+        try:
+            method, auth = authorization.split(" ", 1)
+            username, password = base64.b64decode(auth.strip(), validate=True).split(b":", 1)
+        except (ValueError, binascii.Error):
+            return False
+        if method.upper() != "BASIC":
+            return False
+
+        # Compare both, so the response time doesn't reveal whether the username was right.
+        username_ok = hmac.compare_digest(username, settings.BASIC_AUTH_USERNAME.encode())
+        password_ok = hmac.compare_digest(password, settings.BASIC_AUTH_PASSWORD.encode())
+        if not (username_ok and password_ok):
+            return False
 
-            if method.upper() != "BASIC":
-                return self.unauthorized()
+        with self.lock:
+            self.valid_headers[key] = True
+            if len(self.valid_headers) > BASIC_AUTH_CACHE_SIZE:
+                self.valid_headers.popitem(last=False)
+        return True
 
-            auth = base64.b64decode(auth.strip()).decode("utf-8")
-            username, password = auth.split(":", 1)
-            if username == settings.BASIC_AUTH_USERNAME and password == settings.BASIC_AUTH_PASSWORD:
-                return self.get_response(request)
+    def process_request(self, request):
+        if self.is_exempt(request.path_info):
+            return None
+
+        authorization = request.META.get("HTTP_AUTHORIZATION")
+        if authorization and (settings.BASIC_AUTH_USERNAME and settings.BASIC_AUTH_PASSWORD):
+            if self.is_authorized(authorization):
+                return None
 
         return self.unauthorized()
+
+
+class DatabaseTimingMiddleware:
+    """Reports how many queries each request made, how long they took and how many database connections it had to open,
+    in a Server-Timing header that shows up in browser developer tools, and in the debug log.
+
+    Queries are timed on the request's own thread, so under ASGI Django runs this middleware in a thread too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = []
+
+        def time_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append(time.perf_counter() - start)
+
+        closed = {alias for alias in connections if connections[alias].connection is None}
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(time_query))
+            response = self.get_response(request)
+        opened = len([alias for alias in closed if connections[alias].connection is not None])
+
+        duration = sum(queries) * 1000
+        response["Server-Timing"] = f'db;dur={duration:.1f};desc="{len(queries)} queries, {opened} new connections"'
+        logger.debug("%s made %d queries in %.1fms and opened %d connections", request.path, len(queries), duration, opened)
+        return response
+
+
+class ReplicaMiddleware(AsyncCapableMiddleware):
+    """Routes each request's reads between the primary and replica databases (see lib.db.ReplicaRouter).
+
+    GET and HEAD requests without a session cookie are anonymous, so they read everything they can from the replica.
+    After a request writes to the database, a cookie sends the visitor's reads to the primary for
+    DATABASE_REPLICA_PIN_SECONDS, so they don't see data from before their own change while the replica catches up. Every
+    write sets the cookie again, so it lasts that long after the latest one, not the first.
+    """
+
+    def get_routing(self, request):
+        pinned = REPLICA_PIN_COOKIE in request.COOKIES
+        anonymous_read = request.method in ("GET", "HEAD") and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        return {"replica": anonymous_read, "pinned": pinned}
+
+    def process_response(self, request, response, wrote=False):
+        if wrote:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, "1", max_age=settings.DATABASE_REPLICA_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        routing = self.get_routing(request)
+        with route_request(**routing):
+            response = self.get_response(request)
+            wrote = wrote_to_primary()
+        return self.process_response(request, response, wrote)
+
+    async def __acall__(self, request):
+        routing = self.get_routing(request)
+        with route_request(**routing):
+            response = await self.get_response(request)
+            wrote = wrote_to_primary()
+        return self.process_response(request, response, wrote)
@@ -1,5 +1,7 @@
 from django.http import HttpResponse, JsonResponse
 
+from lib.ratelimit import check_rate_limits, rate_limited_response
+
 
 class AjaxableResponseMixin:
     """Mixin to add AJAX support to a form.
@@ -23,3 +25,22 @@ class AjaxableResponseMixin:
             return JsonResponse(data)
         else:
             return response
+
+
+class RateLimitMixin:
+    """Mixin to reject requests over any of the view's `rate_limits` (lib.ratelimit.RateLimit objects) with a 429,
+    before the view does any work.
+    """
+
+    rate_limits = []
+    rate_limit_methods = ("POST",)
+
+    def should_rate_limit(self, request):
+        return request.method in self.rate_limit_methods
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.should_rate_limit(request):
+            retry_after = check_rate_limits(request, self.rate_limits)
+            if retry_after:
+                return rate_limited_response(request, retry_after)
+        return super().dispatch(request, *args, **kwargs)
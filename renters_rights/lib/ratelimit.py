@@ -0,0 +1,121 @@
+import functools
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+
+def ip_key(request):
+    """Returns: the client's IP address.
+
+    Behind a proxy that appends the connecting address to X-Forwarded-For (like Heroku's router), set
+    RATELIMIT_USE_X_FORWARDED_FOR so the last address in the header is used instead of the proxy's.
+    """
+    if getattr(settings, "RATELIMIT_USE_X_FORWARDED_FOR", False) and request.META.get("HTTP_X_FORWARDED_FOR"):
+        return request.META["HTTP_X_FORWARDED_FOR"].split(",")[-1].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def email_key(request):
+    """Returns: the normalized email address posted or passed in the query string, if there is one."""
+    email = request.POST.get("email") or request.GET.get("email")
+    return email.lower().strip() if email else None
+
+
+def email_ip_key(request):
+    """Returns: the normalized email address and the client's IP address, if there is an email address.
+
+    Limits on guessing something sent to an email address can use this alongside a lower limit on `email_key`, so one
+    client can't use up all of the address's guesses by itself.
+    """
+    email = email_key(request)
+    return f"{email}:{ip_key(request)}" if email else None
+
+
+class RateLimit:
+    """A sliding-window limit on how many requests can share a key.
+
+    Counts are kept in the default cache in fixed windows that are incremented atomically. The count for the sliding
+    window is the current window's count plus the previous window's, weighted by how much of it the sliding window still
+    overlaps. Keys are hashed, so a memcached cluster spreads them evenly across its servers.
+
+    Args:
+      scope: a name for the limit, so limits on the same key are counted separately.
+      limit: how many requests are allowed in a window.
+      window: the window length, in seconds.
+      key: a function that takes a request and returns the value to count it under, or None to not count it.
+    """
+
+    def __init__(self, scope, limit, window, key):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.key = key
+
+    def _cache_key(self, value, window_index):
+        digest = hashlib.md5(str(value).encode()).hexdigest()
+        return f"ratelimit:{self.scope}:{digest}:{window_index}"
+
+    def hit(self, request, now=None):
+        """Counts a request against the limit.
+
+        Returns: the number of seconds to wait before retrying if the limit has been exceeded, otherwise None.
+        """
+        value = self.key(request)
+        if value is None:
+            return None
+
+        now = time.time() if now is None else now
+        window_index, elapsed = divmod(now, self.window)
+        window_index = int(window_index)
+
+        current_key = self._cache_key(value, window_index)
+        cache.add(current_key, 0, self.window * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The key was evicted between add() and incr().
+            cache.set(current_key, 1, self.window * 2)
+            current = 1
+        previous = cache.get(self._cache_key(value, window_index - 1), 0)
+
+        if previous * (1 - elapsed / self.window) + current > self.limit:
+            return max(1, math.ceil(self.window - elapsed))
+        return None
+
+
+def check_rate_limits(request, rate_limits):
+    """Counts a request against each of `rate_limits`.
+
+    Returns: the number of seconds to wait before retrying if any limit has been exceeded, otherwise None.
+    """
+    if not getattr(settings, "RATELIMIT_ENABLE", True):
+        return None
+    retry_after = [r for r in (rate_limit.hit(request) for rate_limit in rate_limits) if r is not None]
+    return max(retry_after) if retry_after else None
+
+
+def rate_limited_response(request, retry_after):
+    response = render(request, "429.html", status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def ratelimit(*rate_limits, methods=("POST",)):
+    """Decorates a view function so that requests over any of `rate_limits` are rejected with a 429."""
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = check_rate_limits(request, rate_limits)
+                if retry_after:
+                    return rate_limited_response(request, retry_after)
+            return view_func(request, *args, **kwargs)
+
+        return wrapped_view
+
+    return decorator
@@ -0,0 +1,118 @@
+import mock
+from django.core.cache import caches
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.test import SimpleTestCase, override_settings
+
+from lib.cache import PooledMemcachedMixin, clear_pools
+
+CACHES = {
+    "default": {"BACKEND": "lib.cache.TieredCache", "LOCATION": "shared", "OPTIONS": {"LOCAL_MAX_ENTRIES": 2}},
+    "shared": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tiered-cache-tests"},
+}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        clear_pools()
+        self.addCleanup(clear_pools)
+        self.cache = caches["default"]
+        self.shared = caches["shared"]
+        self.shared.clear()
+
+    def test_values_are_kept_locally(self):
+        self.shared.set("rule-list", "<ul></ul>")
+        self.assertEqual(self.cache.get("rule-list"), "<ul></ul>")
+        self.shared.delete("rule-list")
+        self.assertEqual(self.cache.get("rule-list"), "<ul></ul>")
+
+    def test_local_values_expire(self):
+        self.cache.set("rule-list", "<ul></ul>")
+        self.shared.delete("rule-list")
+        with mock.patch("lib.cache.time.monotonic", return_value=10**9):
+            self.assertIsNone(self.cache.get("rule-list"))
+
+    def test_least_recently_used_values_are_dropped(self):
+        self.cache.set_many({"a": 1, "b": 2})
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.shared.clear()
+        self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+    def test_get_many_only_fetches_missing_keys(self):
+        self.cache.set("a", 1)
+        self.shared.set("b", 2)
+        with mock.patch.object(self.shared, "get_many", wraps=self.shared.get_many) as get_many:
+            self.assertEqual(self.cache.get_many(["a", "b", "c"]), {"a": 1, "b": 2})
+        get_many.assert_called_once_with(["b", "c"], None)
+
+    def test_local_copies_cant_be_changed(self):
+        self.cache.set("rules", ["a"])
+        self.cache.get("rules").append("b")
+        self.assertEqual(self.cache.get("rules"), ["a"])
+
+    def test_atomic_operations_use_the_shared_cache(self):
+        self.assertTrue(self.cache.add("version", 1))
+        self.assertFalse(self.cache.add("version", 1))
+        self.assertEqual(self.cache.incr("version"), 2)
+        self.assertEqual(self.cache.get("version"), 2)
+
+    def test_delete(self):
+        self.cache.set("a", 1)
+        self.cache.delete("a")
+        self.assertFalse(self.cache.has_key("a"))
+        self.assertFalse(self.shared.has_key("a"))
+
+
+class FakeClient:
+    def __init__(self, servers, **options):
+        self.options = options
+        self.disconnect_all = mock.Mock()
+
+    def get(self, key):
+        return key
+
+
+class PooledMemcachedCache(PooledMemcachedMixin, BaseMemcachedCache):
+    def __init__(self, server, params):
+        super().__init__(server, params, library=mock.Mock(Client=FakeClient), value_not_found_exception=ValueError)
+
+
+class PooledMemcachedMixinTests(SimpleTestCase):
+    def setUp(self):
+        clear_pools()
+        self.addCleanup(clear_pools)
+
+    def _cache(self):
+        return PooledMemcachedCache("127.0.0.1:11211", {"OPTIONS": {"username": "eleanor", "POOL_SIZE": 1}})
+
+    def test_clients_are_shared_between_cache_instances(self):
+        first, second = self._cache(), self._cache()
+        with first._cache.pool.client() as client:
+            pass
+        with second._cache.pool.client() as shared_client:
+            self.assertIs(shared_client, client)
+        self.assertEqual(client.options, {"username": "eleanor"})
+
+    def test_calls_use_a_pooled_client(self):
+        cache = self._cache()
+        self.assertEqual(cache._cache.get("a"), "a")
+        cache.close()
+        with cache._cache.pool.client() as client:
+            client.disconnect_all.assert_not_called()
+
+    def test_clients_over_the_pool_size_are_disconnected(self):
+        pool = self._cache()._cache.pool
+        with pool.client() as first, pool.client() as second:
+            pass
+        # The second client went back into the pool first, which left no room for the first.
+        second.disconnect_all.assert_not_called()
+        first.disconnect_all.assert_called_once_with()
+
+    def test_failed_clients_are_dropped(self):
+        pool = self._cache()._cache.pool
+        with self.assertRaises(OSError), pool.client() as client:
+            raise OSError
+        client.disconnect_all.assert_called_once_with()
+        with pool.client() as new_client:
+            self.assertIsNot(new_client, client)
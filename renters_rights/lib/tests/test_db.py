@@ -0,0 +1,140 @@
+import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.admin.models import LogEntry
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sessions.models import Session
+from django.db import OperationalError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from lib import db
+from lib.db import ReplicaRouter, pin_to_primary, replica_reads, route_request, use_primary, use_replica
+from lib.middleware import REPLICA_PIN_COOKIE, ReplicaMiddleware
+from noauth.models import OutboundEmail, User
+from rules.models import Rule
+
+
+@mock.patch("lib.db.replica_available", return_value=True)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_content_is_read_from_the_replica(self, _):
+        with route_request():
+            self.assertEqual(self.router.db_for_read(Rule), "replica")
+            self.assertEqual(self.router.db_for_read(FlatPage), "replica")
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_reads_outside_requests_use_the_primary(self, _):
+        self.assertIsNone(self.router.db_for_read(Rule))
+        self.assertIsNone(self.router.db_for_read(FlatPage))
+
+    def test_reads_in_use_primary_use_the_primary(self, _):
+        with route_request(replica=True), use_primary():
+            self.assertIsNone(self.router.db_for_read(Rule))
+            self.assertIsNone(self.router.db_for_read(LogEntry))
+        with route_request():
+            self.assertEqual(self.router.db_for_read(Rule), "replica")
+
+    def test_reads_in_use_replica_use_the_replica(self, _):
+        with route_request(), use_replica():
+            self.assertEqual(self.router.db_for_read(LogEntry), "replica")
+            self.assertIsNone(self.router.db_for_read(Session))
+            self.assertIsNone(self.router.db_for_read(OutboundEmail))
+
+    def test_replica_reads(self, _):
+        with route_request():
+            self.assertEqual(replica_reads(lambda: getattr(db._state, "use_replica"))(), True)
+
+    def test_writes_pin_reads_to_the_primary(self, _):
+        with route_request():
+            self.assertIsNone(self.router.db_for_write(Rule))
+            self.assertIsNone(self.router.db_for_read(Rule))
+
+    def test_pinned_requests_read_from_the_primary(self, _):
+        with route_request(pinned=True):
+            self.assertIsNone(self.router.db_for_read(Rule))
+        with route_request():
+            pin_to_primary()
+            self.assertIsNone(self.router.db_for_read(Rule))
+
+    def test_unavailable_replica(self, replica_available):
+        replica_available.return_value = False
+        with route_request():
+            self.assertIsNone(self.router.db_for_read(Rule))
+
+    def test_replica_is_never_migrated(self, _):
+        self.assertTrue(self.router.allow_migrate("default", "rules"))
+        self.assertFalse(self.router.allow_migrate("replica", "rules"))
+
+
+class ReplicaAvailableTests(SimpleTestCase):
+    def tearDown(self):
+        db._replica_failed_at = None
+
+    def test_no_replica(self):
+        self.assertFalse(db.replica_available())
+
+    @override_settings(DATABASE_REPLICA_RETRY_SECONDS=30)
+    @mock.patch("lib.db.replica_configured", return_value=True)
+    def test_failed_replica_is_retried_later(self, _):
+        connection = mock.Mock(**{"ensure_connection.side_effect": OperationalError})
+        with mock.patch("lib.db.connections", {"replica": connection}), mock.patch("lib.db.time.monotonic") as now:
+            now.return_value = 100
+            with self.assertLogs("lib.db", "WARNING"):
+                self.assertFalse(db.replica_available())
+            connection.ensure_connection.side_effect = None
+            now.return_value = 110
+            self.assertFalse(db.replica_available())
+            self.assertEqual(connection.ensure_connection.call_count, 1)
+            now.return_value = 131
+            self.assertTrue(db.replica_available())
+
+
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _call(self, request, write=False):
+        def view(request):
+            self.routing = (db._state.use_replica, db.pinned_to_primary())
+            if write:
+                ReplicaRouter().db_for_write(Rule)
+            return HttpResponse("ok")
+
+        return ReplicaMiddleware(view)(request)
+
+    def test_anonymous_reads_use_the_replica(self):
+        response = self._call(self.factory.get("/"))
+        self.assertEqual(self.routing, (True, False))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_logged_in_and_post_requests_dont(self):
+        self.factory.cookies["sessionid"] = "abc"
+        self._call(self.factory.get("/"))
+        self.assertEqual(self.routing, (False, False))
+        self.factory.cookies.clear()
+        self._call(self.factory.post("/"))
+        self.assertEqual(self.routing, (False, False))
+
+    def test_writes_pin_the_following_requests(self):
+        response = self._call(self.factory.post("/"), write=True)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        self.factory.cookies[REPLICA_PIN_COOKIE] = "1"
+        response = self._call(self.factory.get("/"))
+        self.assertEqual(self.routing, (True, True))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_writes_while_pinned_refresh_the_pin(self):
+        self.factory.cookies[REPLICA_PIN_COOKIE] = "1"
+        response = self._call(self.factory.post("/"), write=True)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_async_writes_pin_the_following_requests(self):
+        async def get_response(request):
+            await sync_to_async(ReplicaRouter().db_for_write)(Rule)
+            return HttpResponse("ok")
+
+        response = async_to_sync(ReplicaMiddleware(get_response))(self.factory.post("/"))
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
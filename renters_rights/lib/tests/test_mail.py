@@ -0,0 +1,103 @@
+import smtplib
+
+import mock
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase, override_settings
+
+from lib.mail import PooledEmailBackend, _pools, clear_pools
+
+
+@override_settings(EMAIL_HOST="smtp.example.com", EMAIL_PORT=587, EMAIL_HOST_USER="user", EMAIL_HOST_PASSWORD="pass")
+class PooledEmailBackendTests(SimpleTestCase):
+    def setUp(self):
+        clear_pools()
+        patcher = mock.patch("smtplib.SMTP")
+        self.m_smtp = patcher.start()
+        self.m_smtp.side_effect = lambda *args, **kwargs: self._new_connection()
+        self.connections = []
+        self.addCleanup(patcher.stop)
+        self.addCleanup(clear_pools)
+
+    def _new_connection(self):
+        connection = mock.MagicMock()
+        connection.noop.return_value = (250, b"OK")
+        self.connections.append(connection)
+        return connection
+
+    def _message(self, to="eleanor@shellstrop.com"):
+        return EmailMessage("Hello", "Body", "from@example.com", [to])
+
+    def test_connection_is_reused_between_sends(self):
+        PooledEmailBackend().send_messages([self._message()])
+        PooledEmailBackend().send_messages([self._message()])
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].login.call_count, 1)
+        self.assertEqual(self.connections[0].sendmail.call_count, 2)
+        self.connections[0].quit.assert_not_called()
+
+    def test_unhealthy_pooled_connection_is_replaced(self):
+        PooledEmailBackend().send_messages([self._message()])
+        self.connections[0].noop.side_effect = smtplib.SMTPServerDisconnected
+
+        PooledEmailBackend().send_messages([self._message()])
+
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1].sendmail.call_count, 1)
+
+    @override_settings(EMAIL_POOL_MAX_IDLE_SECONDS=60)
+    def test_idle_pooled_connection_is_replaced(self):
+        with mock.patch("time.monotonic", return_value=1000):
+            PooledEmailBackend().send_messages([self._message()])
+        with mock.patch("time.monotonic", return_value=1061):
+            PooledEmailBackend().send_messages([self._message()])
+
+        self.assertEqual(len(self.connections), 2)
+        self.connections[0].noop.assert_not_called()
+
+    def test_send_reconnects_and_retries_when_disconnected(self):
+        PooledEmailBackend().send_messages([self._message()])
+        self.connections[0].sendmail.side_effect = smtplib.SMTPServerDisconnected
+
+        self.assertEqual(PooledEmailBackend().send_messages([self._message()]), 1)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.connections[1].sendmail.call_count, 1)
+
+    def test_send_raises_when_reconnected_send_fails(self):
+        self.m_smtp.side_effect = None
+        self.m_smtp.return_value.sendmail.side_effect = smtplib.SMTPServerDisconnected
+
+        with self.assertRaises(smtplib.SMTPServerDisconnected):
+            PooledEmailBackend().send_messages([self._message()])
+
+    def test_send_fails_silently_when_asked(self):
+        self.m_smtp.side_effect = None
+        self.m_smtp.return_value.sendmail.side_effect = smtplib.SMTPRecipientsRefused({})
+
+        self.assertEqual(PooledEmailBackend(fail_silently=True).send_messages([self._message()]), 0)
+
+    def test_many_messages_are_sent_over_one_connection(self):
+        messages = [self._message(f"user{i}@example.com") for i in range(10)]
+
+        self.assertEqual(PooledEmailBackend().send_messages(messages), 10)
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(self.connections[0].sendmail.call_count, 10)
+
+    @override_settings(EMAIL_MAX_MESSAGES_PER_CONNECTION=4)
+    def test_connections_are_recycled_after_max_messages(self):
+        messages = [self._message(f"user{i}@example.com") for i in range(10)]
+
+        self.assertEqual(PooledEmailBackend().send_messages(messages), 10)
+        self.assertEqual([c.sendmail.call_count for c in self.connections], [4, 4, 2])
+        self.connections[0].quit.assert_called_once()
+
+    @override_settings(EMAIL_POOL_SIZE=1)
+    def test_connections_beyond_pool_size_are_closed(self):
+        first, second = PooledEmailBackend(), PooledEmailBackend()
+        first.open()
+        second.open()
+        first.close()
+        second.close()
+
+        self.assertEqual(len(_pools[first.pool_key]), 1)
+        self.connections[1].quit.assert_called_once()
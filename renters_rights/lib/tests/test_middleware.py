@@ -0,0 +1,92 @@
+import base64
+
+import mock
+from asgiref.sync import async_to_sync
+from django.contrib.flatpages.models import FlatPage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from lib.middleware import (
+    BASIC_AUTH_CACHE_SIZE,
+    BasicAuthMiddleware,
+    DatabaseTimingMiddleware,
+)
+
+
+def basic_auth(credentials, method="Basic"):
+    return f"{method} {base64.b64encode(credentials.encode()).decode()}"
+
+
+@override_settings(BASIC_AUTH_USERNAME="eleanor", BASIC_AUTH_PASSWORD="forkin-shirtballs", STATIC_URL="/s/")
+class BasicAuthMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = BasicAuthMiddleware(lambda request: HttpResponse("ok"))
+
+    def _get(self, path="/", authorization=None):
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        return self.middleware(self.factory.get(path, **headers))
+
+    def test_valid_credentials_are_allowed(self):
+        self.assertEqual(self._get(authorization=basic_auth("eleanor:forkin-shirtballs")).status_code, 200)
+
+    def test_missing_credentials_are_rejected(self):
+        response = self._get()
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+    def test_wrong_credentials_are_rejected(self):
+        for credentials in ["eleanor:wrong", "chidi:forkin-shirtballs", "eleanor:forkin-shirtballs:"]:
+            self.assertEqual(self._get(authorization=basic_auth(credentials)).status_code, 401)
+
+    def test_malformed_headers_are_rejected(self):
+        for authorization in ["Basic", "Basic !!!", basic_auth("eleanor"), basic_auth("eleanor:forkin-shirtballs", "Bearer")]:
+            self.assertEqual(self._get(authorization=authorization).status_code, 401)
+
+    def test_static_files_and_exempt_paths_are_allowed(self):
+        self.assertEqual(self._get("/s/app.css").status_code, 200)
+        with override_settings(BASIC_AUTH_EXEMPT_PATHS=["/health/"]):
+            self.assertEqual(self._get("/health/").status_code, 200)
+
+    def test_valid_headers_are_remembered(self):
+        authorization = basic_auth("eleanor:forkin-shirtballs")
+        self._get(authorization=authorization)
+        with mock.patch("base64.b64decode") as m_b64decode:
+            self.assertEqual(self._get(authorization=authorization).status_code, 200)
+        m_b64decode.assert_not_called()
+
+    def test_remembered_headers_are_limited(self):
+        for i in range(BASIC_AUTH_CACHE_SIZE + 5):
+            with override_settings(BASIC_AUTH_PASSWORD=f"password{i}"):
+                self._get(authorization=basic_auth(f"eleanor:password{i}"))
+        self.assertEqual(len(self.middleware.valid_headers), BASIC_AUTH_CACHE_SIZE)
+
+    def test_remembered_headers_are_rejected_after_password_changes(self):
+        authorization = basic_auth("eleanor:forkin-shirtballs")
+        self._get(authorization=authorization)
+        with override_settings(BASIC_AUTH_PASSWORD="new-password"):
+            self.assertEqual(self._get(authorization=authorization).status_code, 401)
+
+    def test_async_requests(self):
+        async def get_response(request):
+            return HttpResponse("ok")
+
+        middleware = BasicAuthMiddleware(get_response)
+        self.assertEqual(async_to_sync(middleware)(self.factory.get("/")).status_code, 401)
+        request = self.factory.get("/", HTTP_AUTHORIZATION=basic_auth("eleanor:forkin-shirtballs"))
+        self.assertEqual(async_to_sync(middleware)(request).status_code, 200)
+
+
+class DatabaseTimingMiddlewareTests(TestCase):
+    def test_queries_are_counted(self):
+        def view(request):
+            list(FlatPage.objects.all())
+            list(FlatPage.objects.all())
+            return HttpResponse("ok")
+
+        response = DatabaseTimingMiddleware(view)(RequestFactory().get("/"))
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="2 queries, 0 new connections"$')
+
+    def test_requests_without_queries(self):
+        response = DatabaseTimingMiddleware(lambda request: HttpResponse("ok"))(RequestFactory().get("/"))
+        self.assertEqual(response["Server-Timing"], 'db;dur=0.0;desc="0 queries, 0 new connections"')
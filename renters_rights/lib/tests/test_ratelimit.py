@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.views import View
+
+from lib.mixins import RateLimitMixin
+from lib.ratelimit import RateLimit, email_ip_key, email_key, ip_key, ratelimit
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.rate_limit = RateLimit("test", 3, 60, email_key)
+
+    def _request(self, email="eleanor@shellstrop.com"):
+        return self.factory.post("/", {"email": email})
+
+    def test_requests_under_limit_are_allowed(self):
+        for _ in range(3):
+            self.assertIsNone(self.rate_limit.hit(self._request(), now=1000))
+
+    def test_requests_over_limit_are_rejected_until_window_ends(self):
+        for _ in range(3):
+            self.rate_limit.hit(self._request(), now=1000)
+        self.assertEqual(self.rate_limit.hit(self._request(), now=1000), 20)
+
+    def test_keys_are_counted_separately(self):
+        for _ in range(3):
+            self.rate_limit.hit(self._request(), now=1000)
+        self.assertIsNone(self.rate_limit.hit(self._request("chidi@anagonye.com"), now=1000))
+
+    def test_keys_are_normalized(self):
+        for _ in range(3):
+            self.rate_limit.hit(self._request(), now=1000)
+        self.assertIsNotNone(self.rate_limit.hit(self._request(" Eleanor@Shellstrop.com"), now=1000))
+
+    def test_previous_window_is_weighted_by_overlap(self):
+        for _ in range(3):
+            self.rate_limit.hit(self._request(), now=1000)
+        # A quarter of the way into the next window, 3 * 0.75 earlier requests still count.
+        self.assertIsNotNone(self.rate_limit.hit(self._request(), now=1035))
+        cache.clear()
+        for _ in range(3):
+            self.rate_limit.hit(self._request(), now=1000)
+        # Almost all of the way through, they barely count.
+        self.assertIsNone(self.rate_limit.hit(self._request(), now=1079))
+        self.assertIsNone(self.rate_limit.hit(self._request(), now=1079))
+
+    def test_requests_without_a_key_are_not_counted(self):
+        for _ in range(5):
+            self.assertIsNone(self.rate_limit.hit(self.factory.post("/"), now=1000))
+
+    def test_ip_key_uses_remote_addr(self):
+        request = self.factory.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2")
+        self.assertEqual(ip_key(request), "10.0.0.1")
+
+    @override_settings(RATELIMIT_USE_X_FORWARDED_FOR=True)
+    def test_ip_key_uses_last_forwarded_address_when_configured(self):
+        request = self.factory.get("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 2.2.2.2")
+        self.assertEqual(ip_key(request), "2.2.2.2")
+
+    def test_email_ip_key_counts_each_ip_address_separately(self):
+        rate_limit = RateLimit("test-email-ip", 3, 60, email_ip_key)
+        for _ in range(3):
+            rate_limit.hit(self.factory.post("/", {"email": "eleanor@shellstrop.com"}, REMOTE_ADDR="10.0.0.1"), now=1000)
+
+        self.assertIsNotNone(
+            rate_limit.hit(self.factory.post("/", {"email": "eleanor@shellstrop.com"}, REMOTE_ADDR="10.0.0.1"), now=1000)
+        )
+        self.assertIsNone(
+            rate_limit.hit(self.factory.post("/", {"email": "eleanor@shellstrop.com"}, REMOTE_ADDR="10.0.0.2"), now=1000)
+        )
+        self.assertIsNone(email_ip_key(self.factory.post("/", REMOTE_ADDR="10.0.0.1")))
+
+
+class LimitedView(RateLimitMixin, View):
+    rate_limits = [RateLimit("test-ip", 2, 60, ip_key)]
+
+    def get(self, request):
+        return HttpResponse("ok")
+
+    def post(self, request):
+        return HttpResponse("ok")
+
+
+@ratelimit(RateLimit("test-fn-ip", 2, 60, ip_key))
+def limited_view(request):
+    return HttpResponse("ok")
+
+
+class RateLimitViewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def test_mixin_rejects_requests_over_limit(self):
+        responses = [LimitedView.as_view()(self.factory.post("/")) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
+        self.assertIn("Retry-After", responses[2])
+
+    def test_mixin_only_limits_rate_limit_methods(self):
+        responses = [LimitedView.as_view()(self.factory.get("/")) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200])
+
+    @override_settings(RATELIMIT_ENABLE=False)
+    def test_limits_can_be_disabled(self):
+        responses = [LimitedView.as_view()(self.factory.post("/")) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200])
+
+    def test_decorator_rejects_requests_over_limit(self):
+        responses = [limited_view(self.factory.post("/")) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 429])
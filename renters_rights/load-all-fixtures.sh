@@ -1,6 +1,5 @@
 #!/bin/bash
-python -m pip install PyYaml
-./manage.py loaddata $(find . -type f -name '*.yaml' | grep fixtures | grep -v local | sed ':a;N;$!ba;s/\n/ /g')
+./manage.py load_rules --sync
 
 # MIT License
 
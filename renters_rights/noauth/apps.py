@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class NoAuthConfig(AppConfig):
     name = "noauth"
+
+    def ready(self):
+        from noauth.emails import compile_email_templates
+
+        compile_email_templates()
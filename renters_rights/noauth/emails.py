@@ -0,0 +1,137 @@
+import logging
+import re
+import threading
+import time
+
+from django.template import engines
+from django.template.loader_tags import ExtendsNode
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+# Every template sent as email. They're compiled when the app starts, so sending never touches the template loaders.
+EMAIL_TEMPLATES = [
+    "log-in-email.txt",
+    "log-in-email.html",
+    "username-pending-change-email.txt",
+    "username-pending-change-email.html",
+    "username-changed-email.txt",
+    "username-changed-email.html",
+]
+
+STYLE_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.DOTALL | re.IGNORECASE)
+CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+SIMPLE_SELECTOR_RE = re.compile(r"^(\.?[a-zA-Z][\w-]*)$")
+TAG_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)((?:\s[^<>]*?)?)(/?)>")
+CLASS_ATTR_RE = re.compile(r"""\sclass\s*=\s*["']([^"']*)["']""", re.IGNORECASE)
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def parse_styles(html):
+    """Parses the element and class rules out of an HTML document's <style> blocks.
+
+    Rules with combinators or pseudo-classes can't be inlined, so they're skipped.
+
+    Returns: a list of (selector, declarations) tuples, in stylesheet order.
+    """
+    rules = []
+    for stylesheet in STYLE_RE.findall(html):
+        for selectors, declarations in CSS_RULE_RE.findall(CSS_COMMENT_RE.sub("", stylesheet)):
+            declarations = "; ".join(d.strip() for d in declarations.split(";") if d.strip())
+            for selector in selectors.split(","):
+                if SIMPLE_SELECTOR_RE.match(selector.strip()):
+                    rules.append((selector.strip().lower(), declarations))
+    return rules
+
+
+def inline_styles(html, rules):
+    """Adds a style attribute to every tag in `html` that matches one of `rules` and doesn't already have one."""
+
+    def inline(match):
+        tag, attrs, self_closing = match.groups()
+        if "style=" in attrs.lower():
+            return match.group(0)
+        class_attr = CLASS_ATTR_RE.search(attrs)
+        selectors = {tag.lower()} | {f".{c}" for c in (class_attr.group(1).split() if class_attr else [])}
+        declarations = "; ".join(d for selector, d in rules if selector in selectors)
+        if not declarations:
+            return match.group(0)
+        return f'<{tag}{attrs} style="{declarations};"{self_closing}>'
+
+    return TAG_RE.sub(inline, html)
+
+
+class EmailTemplate:
+    """A compiled email template.
+
+    HTML templates that extend a base template have the base template's styles inlined into the rendered email, since
+    many email clients ignore <style> blocks. The styles are parsed once, when the template is compiled, and the compiled
+    template itself is never changed, since the template loaders share it with everything else that renders it. Render
+    counts and times are kept for each template and logged at debug level.
+    """
+
+    def __init__(self, template_name):
+        self.template_name = template_name
+        self.template = engines["django"].get_template(template_name)
+        self.render_count = 0
+        self.render_seconds = 0.0
+        self.style_rules = self._get_parent_styles() if template_name.endswith(".html") else []
+
+    def _get_parent_styles(self):
+        """Returns: the rules parsed from the styles of the template this one extends, if any (see parse_styles)."""
+        extends = next((node for node in self.template.template.nodelist if isinstance(node, ExtendsNode)), None)
+        if not extends or extends.parent_name.is_var:
+            return []
+        return parse_styles(self.template.template.engine.get_template(extends.parent_name.var).source)
+
+    def render(self, context=None, language=None):
+        """Renders the template.
+
+        Args:
+          context: a dict of template variables.
+          language: the language to render in. Defaults to the active language.
+
+        Returns: the rendered template.
+        """
+        start = time.perf_counter()
+        with translation.override(language or translation.get_language()):
+            rendered = self.template.render(context)
+        if self.style_rules:
+            rendered = inline_styles(rendered, self.style_rules)
+        elapsed = time.perf_counter() - start
+        self.render_count += 1
+        self.render_seconds += elapsed
+        logger.debug("Rendered %s in %.3fms", self.template_name, elapsed * 1000)
+        return rendered
+
+
+def get_email_template(template_name):
+    """Gets a compiled email template, compiling it if it hasn't been already.
+
+    Returns: an EmailTemplate.
+    """
+    template = _templates.get(template_name)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(template_name)
+            if template is None:
+                template = _templates[template_name] = EmailTemplate(template_name)
+    return template
+
+
+def render_email_template(template_name, context=None, language=None):
+    return get_email_template(template_name).render(context, language)
+
+
+def compile_email_templates():
+    """Compiles every template in EMAIL_TEMPLATES."""
+    for template_name in EMAIL_TEMPLATES:
+        get_email_template(template_name)
+
+
+def clear_email_templates():
+    with _templates_lock:
+        _templates.clear()
@@ -15,6 +15,9 @@ class LoginForm(forms.Form):
 class CodeForm(forms.Form):
     email = forms.EmailField(label="Email address", max_length=100)
     code = forms.CharField(label="Code", max_length=20)
+    # The time step the code was issued in, from the emailed link or the log in form's redirect. Codes are only valid with
+    # it, but a missing step is reported like any other invalid code.
+    step = forms.IntegerField(widget=forms.HiddenInput, required=False)
 
 
 class UserProfileForm(forms.Form):
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired sessions from the database in batches, so a large backlog doesn't hold locks or bloat the "
+        "write-ahead log the way one big DELETE would."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="How many sessions to delete per transaction.")
+        parser.add_argument("--pause", type=float, default=0, help="Seconds to wait between batches.")
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE not in (
+            "django.contrib.sessions.backends.db",
+            "django.contrib.sessions.backends.cached_db",
+        ):
+            raise CommandError(f"{settings.SESSION_ENGINE} doesn't store sessions in the database; nothing to expire.")
+
+        start = time.perf_counter()
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(
+                    Session.objects.filter(expire_date__lt=now).values_list("session_key", flat=True)[: options["batch_size"]]
+                )
+                if not keys:
+                    break
+                deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options["pause"]:
+                time.sleep(options["pause"])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired sessions in {time.perf_counter() - start:.2f}s"))
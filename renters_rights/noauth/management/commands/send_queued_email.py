@@ -0,0 +1,67 @@
+import logging
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from noauth.models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Sends queued emails, retrying failures with exponential backoff. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send the emails that are due and exit.")
+        parser.add_argument("--batch-size", type=int, default=50, help="How many emails to send per SMTP connection.")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds to wait between checks for new emails.")
+
+    def handle(self, *args, **options):
+        while True:
+            # This runs for days, so like a request it has to drop connections that are too old or the database closed.
+            close_old_connections()
+            try:
+                sent, failed = self.send_batch(options["batch_size"])
+            except OperationalError:
+                if options["once"]:
+                    raise
+                logger.warning("Couldn't reach the database to send queued emails, trying again", exc_info=True)
+                sent = failed = 0
+            if sent or failed:
+                self.stdout.write(f"{sent} sent, {failed} failed")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
+
+    def send_batch(self, batch_size):
+        """Sends a batch of due emails over one connection.
+
+        The batch is claimed in a short transaction (see OutboundEmail.claim), so several workers can run without
+        sending the same email twice. Each email's result is saved as soon as it's sent, so a slow SMTP server doesn't
+        hold row locks or a transaction open, and a crash part way through doesn't lose the emails already sent.
+
+        Returns: a (sent, failed) tuple of counts.
+        """
+        sent = failed = 0
+        emails = OutboundEmail.claim(batch_size)
+        if not emails:
+            return sent, failed
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception:
+            # Each email will try to connect again, and record the error and back off if it can't.
+            pass
+        try:
+            for email in emails:
+                if email.send(connection):
+                    sent += 1
+                else:
+                    failed += 1
+        finally:
+            connection.close()
+        return sent, failed
@@ -1,10 +1,33 @@
+import datetime
+import hashlib
+import secrets
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.fields import ArrayField
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
 from django.utils.text import slugify
+from django.utils.translation import gettext_lazy as _
 
 from lib.models import BaseModel
 
+from .emails import render_email_template
+
 DEFAULT_CODE_LENGTH = 6
 DEFAULT_CODE_TTL_MINUTES = 60
+DEFAULT_EMAIL_MAX_ATTEMPTS = 5
+DEFAULT_EMAIL_RETRY_SECONDS = 60
+DEFAULT_EMAIL_LEASE_SECONDS = 600
+# Codes are derived from the time step they were issued in, so a code stays valid for between the TTL and the TTL plus
+# one step.
+CODE_STEP_SECONDS = 300
 
 
 class User(AbstractUser, BaseModel):
@@ -14,3 +37,253 @@ class User(AbstractUser, BaseModel):
     @property
     def slug(self):
         return slugify(self.username)
+
+
+class OutboundEmail(BaseModel):
+    """An email waiting to be sent by the `send_queued_email` worker.
+
+    Emails are rendered when they're queued, so the worker doesn't need the request, the active language or the
+    templates, and a slow SMTP server never holds up a request.
+    """
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = ArrayField(models.EmailField())
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["next_attempt_at"], name="outboundemail_pending_idx", condition=models.Q(sent_at=None))]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)}"
+
+    @classmethod
+    def enqueue(cls, subject, to, template, html_template=None, context=None, from_email=None):
+        """Renders an email and queues it to be sent.
+
+        Args:
+          subject: the email's subject.
+          to: a list of recipient addresses.
+          template: the name of the plain text template.
+          html_template: the name of the HTML template, if the email has an HTML alternative.
+          context: the context to render the templates with.
+          from_email: the sender. Defaults to DEFAULT_FROM_EMAIL.
+
+        Returns: the queued OutboundEmail.
+        """
+        return cls.objects.create(
+            subject=str(subject),
+            body=render_email_template(template, context),
+            html_body=render_email_template(html_template, context) if html_template else "",
+            from_email=from_email or "",
+            to=list(to),
+        )
+
+    @classmethod
+    def pending(cls):
+        """Returns: emails that are due to be sent and haven't used up their attempts."""
+        max_attempts = getattr(settings, "EMAIL_QUEUE_MAX_ATTEMPTS", DEFAULT_EMAIL_MAX_ATTEMPTS)
+        return cls.objects.filter(sent_at=None, attempts__lt=max_attempts, next_attempt_at__lte=timezone.now())
+
+    @classmethod
+    def claim(cls, batch_size):
+        """Claims a batch of due emails for one worker, by moving their next attempt past EMAIL_QUEUE_LEASE_SECONDS
+        from now. Rows are locked with SKIP LOCKED only for as long as that takes, so several workers can run without
+        claiming the same email, and the emails are sent outside the transaction. If the worker dies before sending
+        them, they're picked up again once the lease runs out.
+
+        Args:
+          batch_size: how many emails to claim.
+
+        Returns: a list of the claimed emails.
+        """
+        lease_seconds = getattr(settings, "EMAIL_QUEUE_LEASE_SECONDS", DEFAULT_EMAIL_LEASE_SECONDS)
+        with transaction.atomic():
+            emails = list(cls.pending().order_by("next_attempt_at").select_for_update(skip_locked=True)[:batch_size])
+            if emails:
+                cls.objects.filter(pk__in=[email.pk for email in emails]).update(
+                    next_attempt_at=timezone.now() + datetime.timedelta(seconds=lease_seconds)
+                )
+        return emails
+
+    def to_message(self, connection=None):
+        msg = EmailMultiAlternatives(self.subject, self.body, self.from_email or None, self.to, connection=connection)
+        if self.html_body:
+            msg.attach_alternative(self.html_body, "text/html")
+        return msg
+
+    def send(self, connection=None):
+        """Sends the email, recording the failure and scheduling a retry with exponential backoff if it can't be sent.
+
+        Returns: True if the email was sent, otherwise False.
+        """
+        try:
+            self.to_message(connection).send()
+        except Exception as e:
+            retry_seconds = getattr(settings, "EMAIL_QUEUE_RETRY_SECONDS", DEFAULT_EMAIL_RETRY_SECONDS)
+            self.next_attempt_at = timezone.now() + datetime.timedelta(seconds=retry_seconds * 2**self.attempts)
+            self.attempts += 1
+            self.last_error = repr(e)
+            self.save(update_fields=["attempts", "next_attempt_at", "last_error", "modified_at"])
+            return False
+
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.save(update_fields=["attempts", "sent_at", "modified_at"])
+        return True
+
+
+class AuthCode:
+    """A log in code for a user.
+
+    Codes aren't stored anywhere. A code is an HMAC of the user and the time step it was issued in. The step is sent
+    along with the code, in the emailed link and the code form, so a code is checked by recomputing it for that step
+    alone, as long as the step is inside `NOAUTH_CODE_TTL_MINUTES`. That way each guess is checked against a single code,
+    however many steps the TTL spans. Because the user's last login is part of the HMAC, logging in invalidates every
+    code sent before it. Used codes are also recorded in a small set of cache keys
+    that expire with the code, so a code can only be used once even when two requests race.
+
+    With `NOAUTH_DEFER_USER_CREATION`, codes can be sent to an email address that doesn't have a user yet. The code's
+    user is then an unsaved User, and `save_user` creates it once the code has been used.
+    """
+
+    key_salt = "noauth.models.AuthCode"
+
+    def __init__(self, user, code, next_page=None, step=None):
+        self.user = user
+        self.code = code
+        self.next_page = next_page or "/"
+        self.step = step
+
+    @staticmethod
+    def generate_code(length=None):
+        """Generates a random numeric code, for flows that need a code that isn't tied to a log in."""
+        length = length or getattr(settings, "NOAUTH_CODE_LENGTH", DEFAULT_CODE_LENGTH)
+        return "".join(secrets.choice("0123456789") for _ in range(length))
+
+    @staticmethod
+    def _get_ttl_seconds():
+        return getattr(settings, "NOAUTH_CODE_TTL_MINUTES", DEFAULT_CODE_TTL_MINUTES) * 60
+
+    @staticmethod
+    def get_current_step():
+        return int(time.time()) // CODE_STEP_SECONDS
+
+    @classmethod
+    def _make_code(cls, user, step):
+        """Derives the code for a user and time step.
+
+        Args:
+          user: the user the code is for.
+          step: the time step the code was issued in.
+
+        Returns: a numeric code of `NOAUTH_CODE_LENGTH` digits.
+        """
+        length = getattr(settings, "NOAUTH_CODE_LENGTH", DEFAULT_CODE_LENGTH)
+        last_login = "" if user.last_login is None else user.last_login.replace(microsecond=0, tzinfo=None)
+        value = f"{user.pk}{user.username}{user.password}{last_login}{step}"
+        digest = salted_hmac(cls.key_salt, value, algorithm="sha256").hexdigest()
+        return str(int(digest, 16) % 10**length).zfill(length)
+
+    @staticmethod
+    def _get_cache_id(user):
+        return hashlib.md5(user.username.encode()).hexdigest()
+
+    @classmethod
+    def _create_code_for_user(cls, user, next_page=None, step=None):
+        if not user.is_active:
+            return None
+        step = cls.get_current_step() if step is None else step
+        return cls(user, cls._make_code(user, step), next_page, step)
+
+    @classmethod
+    def send_auth_code(cls, user, code_uri, next_page=None, step=None):
+        """Queues an email with a log in code and link to a user.
+
+        A user is sent at most one email per time step, since they would receive the same code again.
+
+        Args:
+          user: the user to send the code to. May be unsaved, if user creation is deferred.
+          code_uri: the absolute URI of the page the code is entered on.
+          next_page: the page to send the user to after they log in.
+          step: the time step to issue the code in. Defaults to the current step.
+
+        Returns: True if an email was queued, otherwise False.
+        """
+        auth_code = cls._create_code_for_user(user, next_page, step)
+        if not auth_code:
+            return False
+
+        if not cache.add(f"noauth:code-sent:{cls._get_cache_id(user)}:{auth_code.step}", True, CODE_STEP_SECONDS):
+            return False
+
+        link_params = {"code": auth_code.code, "email": user.email, "step": auth_code.step}
+        if next_page:
+            link_params["next"] = next_page
+        context = {
+            "code": auth_code.code,
+            "code_link": f"{code_uri}?{urlencode(link_params)}",
+            "code_uri": code_uri,
+            "email": user.email,
+            "site_name": settings.SITE_NAME,
+        }
+        subject = _(f"Your {settings.SITE_NAME} log in code")
+        OutboundEmail.enqueue(subject, [user.email], "log-in-email.txt", "log-in-email.html", context)
+        return True
+
+    @classmethod
+    def get_auth_code(cls, email, code, step, next_page=None):
+        """Gets the auth code for a user, if the code is valid and hasn't expired.
+
+        Args:
+          email: the email address the code was sent to.
+          code: the code the user entered.
+          step: the time step the code was issued in.
+          next_page: the page to send the user to after they log in.
+
+        Returns: an AuthCode, or None if the code isn't valid.
+        """
+        if not email or not code:
+            return None
+        try:
+            step = int(step)
+        except (TypeError, ValueError):
+            return None
+        current_step = cls.get_current_step()
+        if not current_step - cls._get_ttl_seconds() // CODE_STEP_SECONDS <= step <= current_step:
+            return None
+
+        user = User.objects.filter(username=email).first()
+        if user is None and getattr(settings, "NOAUTH_DEFER_USER_CREATION", True):
+            user = User(username=email, email=email)
+        if not user or not user.is_active:
+            return None
+
+        if constant_time_compare(cls._make_code(user, step), code.strip()):
+            return cls(user, code.strip(), next_page, step)
+        return None
+
+    def use(self):
+        """Marks the code as used.
+
+        Returns: True if this call used the code, or False if it had already been used.
+        """
+        return cache.add(
+            f"noauth:code-used:{self._get_cache_id(self.user)}:{self.step}", True, self._get_ttl_seconds() + CODE_STEP_SECONDS
+        )
+
+    def save_user(self):
+        """Creates the code's user, if it was sent to an email address that didn't have a user yet.
+
+        Returns: the saved user.
+        """
+        if self.user.pk is None:
+            self.user, _ = User.objects.get_or_create(
+                username=self.user.username, defaults={"email": self.user.email, "password": make_password(None)}
+            )
+        return self.user
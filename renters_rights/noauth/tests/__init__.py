@@ -0,0 +1,26 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from noauth.models import AuthCode, User
+
+# The views and forms for changing a username are still here, but the fields they use were removed from User.
+USERNAME_CHANGE_REMOVED = "User no longer has the pending username change fields (see noauth migration 0007)"
+
+
+def create_code(user):
+    """Returns: the code and time step of a new log in code for a user."""
+    auth_code = AuthCode._create_code_for_user(user)
+    return auth_code.code, auth_code.step
+
+
+@override_settings(ROOT_URLCONF="noauth.tests.urls")
+class UnitBaseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.u = User.objects.create_user(
+            "eleanor@shellstrop.com", "eleanor@shellstrop.com", None, first_name="Eleanor", last_name="Shellstrop"
+        )
+
+    def setUp(self):
+        # Rate limits are counted in the cache.
+        cache.clear()
@@ -0,0 +1,84 @@
+from datetime import timedelta
+from io import StringIO
+
+import mock
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from noauth.models import OutboundEmail
+
+
+class SendQueuedEmailCommandTests(TestCase):
+    def setUp(self):
+        # It would close the connection each test runs in a transaction on.
+        patcher = mock.patch("noauth.management.commands.send_queued_email.close_old_connections")
+        self.m_close_old_connections = patcher.start()
+        self.addCleanup(patcher.stop)
+        for address in ["eleanor@shellstrop.com", "chidi@anagonye.com"]:
+            OutboundEmail.enqueue("Hello", [address], "log-in-email.txt", "log-in-email.html", {"code": "123"})
+
+    def test_once_sends_due_emails_and_exits(self):
+        out = StringIO()
+        call_command("send_queued_email", once=True, stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutboundEmail.objects.filter(sent_at=None).exists())
+        self.assertIn("2 sent, 0 failed", out.getvalue())
+
+    def test_once_sends_in_batches(self):
+        out = StringIO()
+        call_command("send_queued_email", once=True, batch_size=1, stdout=out)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(out.getvalue().count("1 sent, 0 failed"), 2)
+
+    @mock.patch("django.core.mail.EmailMultiAlternatives.send", side_effect=ConnectionRefusedError)
+    def test_once_does_not_retry_failures_immediately(self, m_send):
+        out = StringIO()
+        call_command("send_queued_email", once=True, stdout=out)
+        self.assertEqual(m_send.call_count, 2)
+        self.assertIn("0 sent, 2 failed", out.getvalue())
+        self.assertFalse(OutboundEmail.pending().exists())
+
+    @mock.patch("noauth.management.commands.send_queued_email.time.sleep", side_effect=[None, KeyboardInterrupt])
+    def test_keeps_running_when_the_database_goes_away(self, _):
+        with mock.patch.object(OutboundEmail, "claim", side_effect=[OperationalError, []]) as m_claim:
+            with self.assertLogs("noauth.management.commands.send_queued_email", "WARNING"):
+                with self.assertRaises(KeyboardInterrupt):
+                    call_command("send_queued_email", stdout=StringIO())
+        self.assertEqual(m_claim.call_count, 2)
+        self.assertEqual(self.m_close_old_connections.call_count, 2)
+
+    def test_saves_each_email_as_it_is_sent(self):
+        with mock.patch("django.core.mail.EmailMultiAlternatives.send", side_effect=[1, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("send_queued_email", once=True, stdout=StringIO())
+
+        self.assertEqual(OutboundEmail.objects.exclude(sent_at=None).count(), 1)
+        # The other email is still leased to the worker that died, so it's sent again once the lease runs out.
+        self.assertFalse(OutboundEmail.pending().exists())
+
+
+class ExpireSessionsCommandTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f"expired{i}", session_data="", expire_date=now - timedelta(days=1)) for i in range(5)]
+            + [Session(session_key="current", session_data="", expire_date=now + timedelta(days=1))]
+        )
+
+    def test_deletes_expired_sessions_in_batches(self):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command("expire_sessions", batch_size=2, stdout=out)
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["current"])
+        self.assertEqual(len([q for q in queries if q["sql"].startswith("DELETE")]), 3)
+        self.assertIn("Deleted 5 expired sessions", out.getvalue())
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_refuses_to_run_without_database_sessions(self):
+        with self.assertRaises(CommandError):
+            call_command("expire_sessions")
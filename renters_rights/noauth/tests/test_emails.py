@@ -0,0 +1,86 @@
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+from hamcrest import assert_that, contains_string, equal_to, is_not
+
+from noauth.emails import (
+    EMAIL_TEMPLATES,
+    clear_email_templates,
+    get_email_template,
+    inline_styles,
+    parse_styles,
+)
+
+
+class EmailTemplateTests(SimpleTestCase):
+    context = {
+        "code": "123456",
+        "code_link": "http://site/code?code=123456",
+        "confirmation_uri": "http://site/confirm",
+        "new_username": "eleanor@shellstrop.com",
+        "old_username": "eleanor@example.com",
+        "site_name": "Renter Haven",
+    }
+
+    def setUp(self):
+        clear_email_templates()
+        self.addCleanup(clear_email_templates)
+
+    def test_every_email_template_compiles(self):
+        for template_name in EMAIL_TEMPLATES:
+            assert_that(get_email_template(template_name).render(self.context), contains_string("Renter Haven"))
+
+    def test_templates_are_compiled_once(self):
+        assert_that(get_email_template("log-in-email.txt"), equal_to(get_email_template("log-in-email.txt")))
+
+    def test_text_templates_render_like_render_to_string(self):
+        for template_name in [t for t in EMAIL_TEMPLATES if t.endswith(".txt")]:
+            assert_that(
+                get_email_template(template_name).render(self.context),
+                equal_to(render_to_string(template_name, self.context)),
+            )
+
+    def test_html_templates_have_styles_inlined(self):
+        html = get_email_template("username-changed-email.html").render(self.context)
+        assert_that(html, contains_string('<p style="margin: 0; padding: 0; border: 0;'))
+        # The base template's own markup is styled too.
+        assert_that(html, contains_string('<td style="margin: 0;'))
+
+    def test_compiling_leaves_the_shared_template_alone(self):
+        get_email_template("username-changed-email.html")
+        assert_that(render_to_string("username-changed-email.html", self.context), is_not(contains_string("<p style=")))
+
+    def test_render_records_timing(self):
+        template = get_email_template("log-in-email.txt")
+        template.render(self.context)
+        template.render(self.context)
+        assert_that(template.render_count, equal_to(2))
+        self.assertGreater(template.render_seconds, 0)
+
+
+class InlineStylesTests(SimpleTestCase):
+    rules = parse_styles("""<style>
+        /* reset */
+        p, h3 { margin: 0; }
+        a:hover { color: red; }
+        div p { color: blue; }
+        h3 { font-size: 2em; }
+        .note { color: green }
+        </style>""")
+
+    def test_parse_styles_skips_selectors_that_cannot_be_inlined(self):
+        assert_that(
+            self.rules,
+            equal_to([("p", "margin: 0"), ("h3", "margin: 0"), ("h3", "font-size: 2em"), (".note", "color: green")]),
+        )
+
+    def test_inline_styles_merges_rules_in_order(self):
+        assert_that(inline_styles("<h3>Hi</h3>", self.rules), equal_to('<h3 style="margin: 0; font-size: 2em;">Hi</h3>'))
+
+    def test_inline_styles_matches_classes(self):
+        assert_that(
+            inline_styles('<p class="note">Hi</p>', self.rules),
+            equal_to('<p class="note" style="margin: 0; color: green;">Hi</p>'),
+        )
+
+    def test_inline_styles_keeps_existing_styles(self):
+        assert_that(inline_styles('<p style="color: red">Hi</p>', self.rules), equal_to('<p style="color: red">Hi</p>'))
@@ -1,4 +1,5 @@
 import datetime
+from unittest import skip
 
 from django.conf import settings
 from django.test import TestCase
@@ -7,6 +8,7 @@ from hamcrest import assert_that, contains_string, equal_to, has_key
 
 from noauth.forms import CodeForm, ConfirmUsernameChangeForm, LoginForm, UserProfileForm
 from noauth.models import User
+from noauth.tests import USERNAME_CHANGE_REMOVED
 
 
 class LoginFormTests(TestCase):
@@ -71,6 +73,7 @@ class UserProfileFormTests(TestCase):
         assert_that(form.errors["email"][0], contains_string("Email addresses already in use."))
 
 
+@skip(USERNAME_CHANGE_REMOVED)
 class ConfirmUsernameChangeFormTests(TestCase):
     def setUp(self):
         self.u = User(
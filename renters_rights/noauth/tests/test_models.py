@@ -1,55 +1,216 @@
+import datetime
+
 import mock
 from django.conf import settings
 from django.core import mail
+from django.core.cache import cache
 from django.template.loader import render_to_string
 from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from hamcrest import assert_that, equal_to, none
+from freezegun import freeze_time
+from hamcrest import assert_that, contains_string, equal_to, none, not_none
 
-from noauth.models import DEFAULT_CODE_LENGTH, AuthCode, User
+from noauth.emails import render_email_template
+from noauth.models import (
+    CODE_STEP_SECONDS,
+    DEFAULT_CODE_LENGTH,
+    AuthCode,
+    OutboundEmail,
+    User,
+)
+from noauth.tests import create_code
 
 
 class AuthCodeModelTests(TestCase):
     def setUp(self):
-        self.u = User.objects.create(is_active=True, email="eleanor@shellstrop.com")
+        cache.clear()
+        self.u = User.objects.create(is_active=True, username="eleanor@shellstrop.com", email="eleanor@shellstrop.com")
 
     def test_create_code_for_user_returns_none_for_inactive_user(self):
         self.u.is_active = False
         self.u.save()
         assert_that(AuthCode._create_code_for_user(self.u), none())
 
-    def test_create_code_for_user_creates_new_code(self):
+    def test_create_code_for_user_creates_valid_code(self):
         expected_auth_code = AuthCode._create_code_for_user(self.u)
-        actual_auth_code = AuthCode.objects.get(user=self.u, code=expected_auth_code.code)
-        assert_that(expected_auth_code.code, equal_to(actual_auth_code.code))
+        actual_auth_code = AuthCode.get_auth_code(self.u.username, expected_auth_code.code, expected_auth_code.step)
+        assert_that(actual_auth_code.user, equal_to(self.u))
 
     def test_generate_code_creates_code_of_default_length(self):
-        code = AuthCode._create_code_for_user(self.u).code
+        code, step = create_code(self.u)
         assert_that(len(code), equal_to(DEFAULT_CODE_LENGTH))
 
     @override_settings(NOAUTH_CODE_LENGTH=19)
     def test_generate_code_creates_code_of_length_defined_in_settings(self):
-        code = AuthCode._create_code_for_user(self.u).code
+        code, step = create_code(self.u)
         assert_that(len(code), equal_to(19))
 
+    def test_get_auth_code_returns_none_for_wrong_code(self):
+        code, step = create_code(self.u)
+        wrong_code = str((int(code) + 1) % 10**DEFAULT_CODE_LENGTH).zfill(DEFAULT_CODE_LENGTH)
+        assert_that(AuthCode.get_auth_code(self.u.username, wrong_code, step), none())
+
+    def test_get_auth_code_returns_none_for_wrong_email(self):
+        code, step = create_code(self.u)
+        assert_that(AuthCode.get_auth_code("tahani@al-jamil.com", code, step), none())
+
+    @override_settings(NOAUTH_CODE_TTL_MINUTES=30)
+    def test_get_auth_code_returns_code_within_ttl(self):
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1000):
+            code, step = create_code(self.u)
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1000 + 30 * 60 // CODE_STEP_SECONDS):
+            assert_that(AuthCode.get_auth_code(self.u.username, code, step), not_none())
+
+    @override_settings(NOAUTH_CODE_TTL_MINUTES=30)
+    def test_get_auth_code_returns_none_if_ttl_past(self):
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1000):
+            code, step = create_code(self.u)
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1001 + 30 * 60 // CODE_STEP_SECONDS):
+            assert_that(AuthCode.get_auth_code(self.u.username, code, step), none())
+
+    def test_get_auth_code_only_checks_the_step_the_code_was_issued_in(self):
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1000):
+            code, step = create_code(self.u)
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1001):
+            assert_that(AuthCode.get_auth_code(self.u.username, code, step + 1), none())
+            assert_that(AuthCode.get_auth_code(self.u.username, code, None), none())
+            assert_that(AuthCode.get_auth_code(self.u.username, code, step), not_none())
+
+    def test_get_auth_code_rejects_steps_in_the_future(self):
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1001):
+            code, step = create_code(self.u)
+        with mock.patch("noauth.models.AuthCode.get_current_step", return_value=1000):
+            assert_that(AuthCode.get_auth_code(self.u.username, code, step), none())
+
+    def test_get_auth_code_returns_none_after_logging_in(self):
+        code, step = create_code(self.u)
+        self.u.last_login = timezone.now()
+        self.u.save()
+        assert_that(AuthCode.get_auth_code(self.u.username, code, step), none())
+
+    def test_get_auth_code_does_not_query_for_codes(self):
+        code, step = create_code(self.u)
+        with self.assertNumQueries(1):
+            AuthCode.get_auth_code(self.u.username, code, step)
+
+    def test_use_only_succeeds_once(self):
+        auth_code = AuthCode._create_code_for_user(self.u)
+        self.assertTrue(AuthCode.get_auth_code(self.u.username, auth_code.code, auth_code.step).use())
+        self.assertFalse(AuthCode.get_auth_code(self.u.username, auth_code.code, auth_code.step).use())
+
     @mock.patch("noauth.models.AuthCode._create_code_for_user")
     def test_send_auth_code_returns_false_when_auth_code_not_created(self, m_create_code_for_user):
-        m_create_code_for_user.return_value = False
+        m_create_code_for_user.return_value = None
         self.assertFalse(AuthCode.send_auth_code(self.u, ""))
 
+    def test_send_auth_code_returns_false_when_code_already_sent(self):
+        self.assertTrue(AuthCode.send_auth_code(self.u, "http://site/code"))
+        self.assertFalse(AuthCode.send_auth_code(self.u, "http://site/code"))
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
     @mock.patch("noauth.models.AuthCode._create_code_for_user")
     def test_send_auth_code(self, m_create_code_for_user):
-        auth_code = AuthCode(code="123", user=self.u)
+        auth_code = AuthCode(self.u, "123", step=1000)
         m_create_code_for_user.return_value = auth_code
-        self.assertTrue(AuthCode.send_auth_code(self.u, "http://site/code?code=123"))
-        self.assertEqual(len(mail.outbox), 1)
-        self.assertEqual(mail.outbox[0].subject, _(f"Your {settings.SITE_NAME} log in code"))
+        self.assertTrue(AuthCode.send_auth_code(self.u, "http://site/code", "/rules"))
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.subject, _(f"Your {settings.SITE_NAME} log in code"))
+        self.assertEqual(email.to, [self.u.email])
 
         context = {
             "code": auth_code.code,
-            "code_uri": "http://site/code?code=123",
+            "code_link": "http://site/code?code=123&email=eleanor%40shellstrop.com&step=1000&next=%2Frules",
+            "code_uri": "http://site/code",
             "email": auth_code.user.email,
             "site_name": settings.SITE_NAME,
         }
-        assert_that(mail.outbox[0].body, equal_to(render_to_string("log-in-email.txt", context)))
-        assert_that(mail.outbox[0].alternatives[0][0], equal_to(render_to_string("log-in-email.html", context)))
+        assert_that(email.body, equal_to(render_to_string("log-in-email.txt", context)))
+        assert_that(email.html_body, equal_to(render_email_template("log-in-email.html", context)))
+
+
+class OutboundEmailModelTests(TestCase):
+    def setUp(self):
+        self.email = OutboundEmail.enqueue(
+            "Hello", ["eleanor@shellstrop.com"], "log-in-email.txt", "log-in-email.html", {"code": "123"}
+        )
+
+    def test_enqueue_renders_templates(self):
+        assert_that(self.email.body, contains_string("123"))
+        assert_that(self.email.html_body, contains_string("123"))
+
+    def test_send_sends_email_and_marks_it_sent(self):
+        self.assertTrue(self.email.send())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["eleanor@shellstrop.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0][0], self.email.html_body)
+        assert_that(self.email.sent_at, not_none())
+        self.assertNotIn(self.email, OutboundEmail.pending())
+
+    @override_settings(EMAIL_QUEUE_RETRY_SECONDS=60)
+    @mock.patch("django.core.mail.EmailMultiAlternatives.send", side_effect=ConnectionRefusedError)
+    def test_send_backs_off_after_failure(self, m_send):
+        with freeze_time("2020-01-01 12:00:00"):
+            self.assertFalse(self.email.send())
+            self.assertFalse(self.email.send())
+
+        self.email.refresh_from_db()
+        assert_that(self.email.sent_at, none())
+        self.assertEqual(self.email.attempts, 2)
+        self.assertEqual(self.email.next_attempt_at, datetime.datetime(2020, 1, 1, 12, 2, tzinfo=datetime.timezone.utc))
+        assert_that(self.email.last_error, contains_string("ConnectionRefusedError"))
+
+    @override_settings(EMAIL_QUEUE_LEASE_SECONDS=600)
+    def test_claim_leases_emails_to_one_worker(self):
+        with freeze_time("2020-01-01 12:00:00"):
+            OutboundEmail.objects.filter(pk=self.email.pk).update(next_attempt_at=timezone.now())
+            self.assertEqual(OutboundEmail.claim(10), [self.email])
+            self.assertEqual(OutboundEmail.claim(10), [])
+
+        with freeze_time("2020-01-01 12:10:00"):
+            self.assertEqual(OutboundEmail.claim(10), [self.email])
+
+    @override_settings(EMAIL_QUEUE_MAX_ATTEMPTS=2)
+    def test_pending_excludes_emails_out_of_attempts(self):
+        OutboundEmail.objects.filter(pk=self.email.pk).update(attempts=2)
+        self.assertNotIn(self.email, OutboundEmail.pending())
+
+
+class DeferredUserCreationTests(TestCase):
+    email = "jason.mendoza@goodplace.com"
+
+    def setUp(self):
+        cache.clear()
+
+    def _pending_user(self):
+        return User(username=self.email, email=self.email)
+
+    def test_code_can_be_sent_without_creating_user(self):
+        self.assertTrue(AuthCode.send_auth_code(self._pending_user(), "http://site/code"))
+        self.assertFalse(User.objects.filter(username=self.email).exists())
+        self.assertEqual(OutboundEmail.objects.get().to, [self.email])
+
+    def test_pending_code_is_valid_and_creates_user_once_used(self):
+        code, step = create_code(self._pending_user())
+
+        auth_code = AuthCode.get_auth_code(self.email, code, step)
+        self.assertTrue(auth_code.use())
+        user = auth_code.save_user()
+
+        self.assertEqual(User.objects.get(username=self.email), user)
+        self.assertEqual(user.email, self.email)
+        self.assertFalse(user.has_usable_password())
+
+    def test_pending_code_is_invalid_once_user_exists(self):
+        code, step = create_code(self._pending_user())
+        auth_code = AuthCode.get_auth_code(self.email, code, step)
+        auth_code.use()
+        auth_code.save_user()
+
+        assert_that(AuthCode.get_auth_code(self.email, code, step), none())
+
+    @override_settings(NOAUTH_DEFER_USER_CREATION=False)
+    def test_pending_code_is_invalid_when_user_creation_is_not_deferred(self):
+        code, step = create_code(self._pending_user())
+        assert_that(AuthCode.get_auth_code(self.email, code, step), none())
@@ -1,10 +1,12 @@
 import datetime
+import urllib
+from unittest import skip
 from unittest.mock import patch
 
 from django.conf import settings
 from django.core import mail
 from django.test import Client, override_settings
-from django.urls import reverse
+from django.urls import reverse, reverse_lazy
 from django.utils import timezone
 from django.utils.translation import gettext as _
 from freezegun import freeze_time
@@ -20,12 +22,12 @@ from hamcrest import (
 
 from noauth.forms import CodeForm, ConfirmUsernameChangeForm, UserProfileForm
 from noauth.models import AuthCode, User
-from noauth.tests import UnitBaseTestCase
+from noauth.tests import USERNAME_CHANGE_REMOVED, UnitBaseTestCase, create_code
 from noauth.views import CodeView
 
 
 class CodeViewTests(UnitBaseTestCase):
-    view_url = reverse("noauth:code")
+    view_url = reverse_lazy("noauth:code")
 
     def test_get_with_code_and_no_email_returns_blank_form(self):
         response = self.client.get(f"{self.view_url}?code=1")
@@ -47,7 +49,7 @@ class CodeViewTests(UnitBaseTestCase):
 
         self.client.get(f"{self.view_url}?email=a@example.com&code=1")
 
-        m_validate_and_get_auth_code.assert_called_once_with("a@example.com", "1")
+        m_validate_and_get_auth_code.assert_called_once_with("a@example.com", "1", None, None)
 
     @patch("noauth.views.CodeView._validate_and_get_auth_code")
     def test_post_with_code_and_email_calls_validate_method(self, m_validate_and_get_auth_code):
@@ -55,7 +57,7 @@ class CodeViewTests(UnitBaseTestCase):
 
         self.client.post(self.view_url, {"email": "a@example.com", "code": 1})
 
-        m_validate_and_get_auth_code.assert_called_once_with("a@example.com", "1")
+        m_validate_and_get_auth_code.assert_called_once_with("a@example.com", "1", None, None)
 
     @patch("noauth.views.CodeView._validate_and_get_auth_code")
     def test_get_with_invalid_data_returns_error(self, m_validate_and_get_auth_code):
@@ -71,70 +73,96 @@ class CodeViewTests(UnitBaseTestCase):
 
     @override_settings(NOAUTH_CODE_TTL_MINUTES=5)
     def test_validate_and_get_redirect_uri_returns_default_path_with_get(self):
-        code = 1234
-
         with freeze_time("09-17-2018 6:30PM") as frozen_datetime:
-            AuthCode.objects.create(user=CodeViewTests.u, code=code)
+            code, step = create_code(CodeViewTests.u)
 
             frozen_datetime.tick(delta=datetime.timedelta(minutes=4))
 
-            response = self.client.get(f"{self.view_url}?code={code}&email={CodeViewTests.u.username}")
+            response = self.client.get(f"{self.view_url}?code={code}&step={step}&email={CodeViewTests.u.username}")
             self.assertRedirects(response, reverse("homepage"))
 
     @override_settings(NOAUTH_CODE_TTL_MINUTES=5)
     def test_validate_and_get_redirect_uri_returns_default_path_with_post(self):
-        code = 1234
-
         with freeze_time("09-17-2018 6:30PM") as frozen_datetime:
-            AuthCode.objects.create(user=CodeViewTests.u, code=code)
+            code, step = create_code(CodeViewTests.u)
 
             frozen_datetime.tick(delta=datetime.timedelta(minutes=4))
 
-            response = self.client.post(self.view_url, {"code": code, "email": CodeViewTests.u.username})
+            response = self.client.post(self.view_url, {"code": code, "step": step, "email": CodeViewTests.u.username})
             self.assertRedirects(response, reverse("homepage"))
 
     @override_settings(NOAUTH_CODE_TTL_MINUTES=5)
     def test_validate_and_get_redirect_uri_returns_next_page_from_auth_code_with_get(self):
-        code = 1234
         next_page = f"{reverse('homepage')}?and=something"
 
         with freeze_time("09-17-2018 6:30PM") as frozen_datetime:
-            AuthCode.objects.create(user=CodeViewTests.u, code=code, next_page=next_page)
+            code, step = create_code(CodeViewTests.u)
 
             frozen_datetime.tick(delta=datetime.timedelta(minutes=4))
 
-            response = self.client.get(f"{self.view_url}?code={code}&email={CodeViewTests.u.username}")
+            response = self.client.get(
+                f"{self.view_url}?code={code}&step={step}&email={CodeViewTests.u.username}&next={urllib.parse.quote_plus(next_page)}"
+            )
             self.assertRedirects(response, next_page)
 
     @override_settings(NOAUTH_CODE_TTL_MINUTES=5)
     def test_validate_and_get_redirect_uri_returns_next_page_from_auth_code_with_post(self):
-        code = 1234
         next_page = f"{reverse('homepage')}?and=something"
 
         with freeze_time("09-17-2018 6:30PM") as frozen_datetime:
-            AuthCode.objects.create(user=CodeViewTests.u, code=code, next_page=next_page)
+            code, step = create_code(CodeViewTests.u)
 
             frozen_datetime.tick(delta=datetime.timedelta(minutes=4))
 
-            response = self.client.post(self.view_url, {"code": code, "email": CodeViewTests.u.username})
+            response = self.client.post(
+                f"{self.view_url}?next={urllib.parse.quote_plus(next_page)}",
+                {"code": code, "step": step, "email": CodeViewTests.u.username},
+            )
             self.assertRedirects(response, next_page)
 
     @override_settings(NOAUTH_CODE_TTL_MINUTES=5)
     def test_validate_and_get_redirect_uri_does_not_find_auth_code_if_ttl_past(self):
-        code = 1234
-
         with freeze_time("09-17-2018 6:30PM") as frozen_datetime:
-            AuthCode.objects.create(user=CodeViewTests.u, code=code)
+            code, step = create_code(CodeViewTests.u)
 
-            frozen_datetime.tick(delta=datetime.timedelta(minutes=6))
+            frozen_datetime.tick(delta=datetime.timedelta(minutes=11))
 
-            redirect_url = CodeView._validate_and_get_auth_code(CodeViewTests.u.email, code)
+            redirect_url = CodeView._validate_and_get_auth_code(CodeViewTests.u.email, code, step)
             assert_that(redirect_url, none())
 
+    def test_guesses_from_one_ip_address_do_not_lock_out_another(self):
+        for _ in range(5):
+            self.client.post(self.view_url, {"email": CodeViewTests.u.email, "code": "1"}, REMOTE_ADDR="10.0.0.1")
+        response = self.client.post(self.view_url, {"email": CodeViewTests.u.email, "code": "1"}, REMOTE_ADDR="10.0.0.1")
+        assert_that(response.status_code, equal_to(429))
+
+        response = self.client.post(self.view_url, {"email": CodeViewTests.u.email, "code": "1"}, REMOTE_ADDR="10.0.0.2")
+        assert_that(response.status_code, equal_to(200))
+
+    def test_guesses_at_one_email_address_are_capped_across_ip_addresses(self):
+        for i in range(20):
+            self.client.post(self.view_url, {"email": CodeViewTests.u.email, "code": "1"}, REMOTE_ADDR=f"10.0.0.{i}")
+        response = self.client.post(self.view_url, {"email": CodeViewTests.u.email, "code": "1"}, REMOTE_ADDR="10.0.1.1")
+        assert_that(response.status_code, equal_to(429))
+
+    def test_code_is_only_accepted_with_the_step_it_was_issued_in(self):
+        code, step = create_code(CodeViewTests.u)
+        response = self.client.post(self.view_url, {"code": code, "step": step - 1, "email": CodeViewTests.u.username})
+        self.assertFormError(response.context["form"], None, _("Invalid e-mail address or code."))
+        response = self.client.post(self.view_url, {"code": code, "email": CodeViewTests.u.username})
+        self.assertFormError(response.context["form"], None, _("Invalid e-mail address or code."))
+
+    def test_validate_and_get_auth_code_only_accepts_a_code_once(self):
+        code, step = create_code(CodeViewTests.u)
+
+        assert_that(CodeView._validate_and_get_auth_code(CodeViewTests.u.email, code, step), is_not(none()))
+        assert_that(CodeView._validate_and_get_auth_code(CodeViewTests.u.email, code, step), none())
+
 
 class LoginViewTests(UnitBaseTestCase):
-    view_url = reverse("noauth:log-in")
+    view_url = reverse_lazy("noauth:log-in")
 
+    @override_settings(NOAUTH_DEFER_USER_CREATION=False)
     @patch("noauth.models.AuthCode.send_auth_code")
     def test_posting_a_user_that_does_not_exist_creates_user(self, m_send_auth_code):
         m_send_auth_code.return_value = True
@@ -143,21 +171,40 @@ class LoginViewTests(UnitBaseTestCase):
         self.client.post(self.view_url, {"email": email})
         assert_that(User.objects.filter(email=email).exists(), equal_to(True))
 
+    @patch("noauth.models.AuthCode.send_auth_code")
+    def test_posting_a_user_that_does_not_exist_sends_code_without_creating_user(self, m_send_auth_code):
+        m_send_auth_code.return_value = True
+        email = f"jason.mendoza@goodplace.com"
+        self.client.post(self.view_url, {"email": email})
+        assert_that(User.objects.filter(email=email).exists(), equal_to(False))
+        assert_that(m_send_auth_code.call_args[0][0].username, equal_to(email))
+
+    def test_code_for_a_user_that_does_not_exist_creates_user(self):
+        email = f"jason.mendoza@goodplace.com"
+        code, step = create_code(User(username=email, email=email))
+
+        response = self.client.get(f"{reverse('noauth:code')}?code={code}&step={step}&email={email}")
+
+        self.assertRedirects(response, reverse("homepage"))
+        assert_that(User.objects.filter(email=email).exists(), equal_to(True))
+
+    @patch("noauth.models.AuthCode.get_current_step", return_value=1000)
     @patch("noauth.models.AuthCode.send_auth_code")
     def test_posting_a_user_who_has_not_received_an_auth_code_sends_auth_code_and_redirects_to_code_page(
-        self, m_send_auth_code
+        self, m_send_auth_code, _
     ):
         m_send_auth_code.return_value = True
         response = self.client.post(self.view_url, {"email": LoginViewTests.u.username})
-        m_send_auth_code.assert_called_once_with(LoginViewTests.u, f"http://testserver{reverse('noauth:code')}", None)
-        self.assertRedirects(response, reverse("noauth:code") + f"?email={LoginViewTests.u.username}")
+        m_send_auth_code.assert_called_once_with(LoginViewTests.u, f"http://testserver{reverse('noauth:code')}", None, 1000)
+        self.assertRedirects(response, reverse("noauth:code") + f"?email={LoginViewTests.u.username}&step=1000")
 
+    @patch("noauth.models.AuthCode.get_current_step", return_value=1000)
     @patch("noauth.models.AuthCode.send_auth_code")
-    def test_posting_a_user_who_has_received_an_auth_code_adds_message_and_redirects(self, m_send_auth_code):
+    def test_posting_a_user_who_has_received_an_auth_code_adds_message_and_redirects(self, m_send_auth_code, _):
         m_send_auth_code.return_value = False
         response = self.client.post(self.view_url, {"email": LoginViewTests.u.username})
-        m_send_auth_code.assert_called_once_with(LoginViewTests.u, f"http://testserver{reverse('noauth:code')}", None)
-        self.assertRedirects(response, reverse("noauth:code") + f"?email={LoginViewTests.u.username}")
+        m_send_auth_code.assert_called_once_with(LoginViewTests.u, f"http://testserver{reverse('noauth:code')}", None, 1000)
+        self.assertRedirects(response, reverse("noauth:code") + f"?email={LoginViewTests.u.username}&step=1000")
         # breakpoint()
         # assert_that(
         #     response.context["messages"], contains(_("Please check your inbox and spam folder for a previously-sent code."))
@@ -165,7 +212,7 @@ class LoginViewTests(UnitBaseTestCase):
 
 
 class LogOutViewTests(UnitBaseTestCase):
-    view_url = reverse("noauth:log-out")
+    view_url = reverse_lazy("noauth:log-out")
 
     def test_get_returns_log_out_page(self):
         response = self.client.get(self.view_url)
@@ -179,8 +226,9 @@ class LogOutViewTests(UnitBaseTestCase):
         self.assertRedirects(response, reverse("homepage"))
 
 
+@skip(USERNAME_CHANGE_REMOVED)
 class UserProfileViewTests(UnitBaseTestCase):
-    view_url = reverse("noauth:account-details")
+    view_url = reverse_lazy("noauth:account-details")
 
     def test_user_profile_view_requires_login(self):
         response = self.client.get(self.view_url)
@@ -265,8 +313,9 @@ class UserProfileViewTests(UnitBaseTestCase):
         self.assertRedirects(response, self.view_url)
 
 
+@skip(USERNAME_CHANGE_REMOVED)
 class ConfirmUsernameChangeViewTests(UnitBaseTestCase):
-    view_url = reverse("noauth:confirm-username-change")
+    view_url = reverse_lazy("noauth:confirm-username-change")
 
     def test_confirm_username_change_view_requires_login(self):
         response = self.client.get(self.view_url)
@@ -0,0 +1,8 @@
+from django.urls import include, path
+
+# The site doesn't route the account views at the moment, so the view tests route them themselves.
+urlpatterns = [
+    path("i18n/", include("django.conf.urls.i18n")),
+    path("", include("rules.urls")),
+    path("account/", include("noauth.urls")),
+]
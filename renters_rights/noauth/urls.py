@@ -0,0 +1,11 @@
+from django.urls import path
+
+from .views import CodeView, LogInView, LogOutView
+
+app_name = "noauth"
+
+urlpatterns = [
+    path("log-in/", LogInView.as_view(), name="log-in"),
+    path("code/", CodeView.as_view(), name="code"),
+    path("log-out/", LogOutView.as_view(), name="log-out"),
+]
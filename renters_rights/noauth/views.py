@@ -1,51 +1,69 @@
-import string
 import urllib
-from secrets import choice
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login, logout
-from django.core.mail import EmailMultiAlternatives
 from django.forms import ValidationError
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect, render
-from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.generic.edit import FormView
 
+from lib.mixins import RateLimitMixin
+from lib.ratelimit import RateLimit, email_ip_key, email_key, ip_key
 from lib.views import ProtectedView
 
 from .forms import CodeForm, ConfirmUsernameChangeForm, LoginForm, UserProfileForm
-from .models import AuthCode, User
+from .models import AuthCode, OutboundEmail, User
 
 
 def normalize_email(email):
     return email.lower().strip() if email else None
 
 
-class CodeView(View):
+def get_safe_next_page(request):
+    next_page = request.GET.get("next")
+    if next_page and url_has_allowed_host_and_scheme(next_page, {request.get_host()}, request.is_secure()):
+        return next_page
+    return None
+
+
+class CodeView(RateLimitMixin, View):
     """Handles the code form where the user enters their email address and code to authenticate.
     Accepts values either via querystring in a GET or in a form POST.
+    Guesses are limited per IP address and per email address, so codes can't be brute forced from one address or many.
+    Each IP address only gets a share of an email address's guesses, so one client can't lock its owner out alone.
     """
 
+    rate_limits = [
+        RateLimit("code-ip", 30, 60 * 60, ip_key),
+        RateLimit("code-email", 20, 60 * 60, email_key),
+        RateLimit("code-email-ip", 5, 60 * 60, email_ip_key),
+    ]
     form_class = CodeForm
     template_name = "code.html"
     success_url = "/"
 
+    def should_rate_limit(self, request):
+        return bool(request.POST.get("code") or request.GET.get("code"))
+
     def get(self, request, *args, **kwargs):
         email = normalize_email(self.request.GET.get("email"))
         code = self.request.GET.get("code")
+        step = self.request.GET.get("step")
+        initial = {"email": email, "code": code, "step": step}
 
         if email and code:
-            form = self.form_class({"email": email, "code": code}, initial={"email": email, "code": code})
+            form = self.form_class(initial, initial=initial)
         else:
-            form = self.form_class(initial={"email": email, "code": code})
+            form = self.form_class(initial=initial)
 
         if email and code and form.is_valid():
-            auth_code = self._validate_and_get_auth_code(email, code)
+            auth_code = self._validate_and_get_auth_code(email, code, form.cleaned_data["step"], get_safe_next_page(request))
             if auth_code:
                 login(request, auth_code.user)
                 messages.add_message(request, messages.SUCCESS, _("You have been logged in."))
@@ -59,7 +77,8 @@ class CodeView(View):
         if form.is_valid():
             email = normalize_email(form.cleaned_data["email"])
             code = form.cleaned_data["code"]
-            auth_code = self._validate_and_get_auth_code(email, code)
+            step = form.cleaned_data["step"]
+            auth_code = self._validate_and_get_auth_code(email, code, step, get_safe_next_page(request))
             if auth_code:
                 login(request, auth_code.user)
                 messages.add_message(request, messages.SUCCESS, _("You have been logged in."))
@@ -70,21 +89,23 @@ class CodeView(View):
         return render(request, self.template_name, {"form": form})
 
     @classmethod
-    def _validate_and_get_auth_code(cls, email, code):
-        """Validates an code and returns a URI to redirect to, if the code is valid.
+    def _validate_and_get_auth_code(cls, email, code, step, next_page=None):
+        """Validates a code and uses it up, if the code is valid.
 
         Args:
           email: The email address associated with the auth code.
           code: The code associated with the auth code.
+          step: The time step the code was issued in.
+          next_page: The page to redirect to after logging in.
 
         Returns:
-          A URI to redirect to if the code is valid, otherwise None.
+          The AuthCode if the code is valid and hadn't been used, otherwise None.
 
         """
-        auth_code = AuthCode.get_auth_code(email, code)
-        if not auth_code:
+        auth_code = AuthCode.get_auth_code(email, code, step, next_page)
+        if not auth_code or not auth_code.use():
             return None
-        auth_code.delete()
+        auth_code.save_user()
         return auth_code
 
     @staticmethod
@@ -106,12 +127,15 @@ class CodeView(View):
         return auth_code.next_page
 
 
-class LogInView(FormView):
+class LogInView(RateLimitMixin, FormView):
     """Handles the login form where users enter their email addresses to start the login process.
     After entering an email address, the user will be sent a log in link and code they can use to log in without a password.
-    If a user doesn't exist, a user is created.
+    If a user doesn't exist, one is created when they first use their code, or straight away if
+    NOAUTH_DEFER_USER_CREATION is off.
+    Requests are limited per IP address and per email address, so the form can't be used to flood inboxes or the database.
     """
 
+    rate_limits = [RateLimit("log-in-ip", 20, 60 * 60, ip_key), RateLimit("log-in-email", 5, 60 * 60, email_key)]
     template_name = "log-in.html"
     form_class = LoginForm
     success_url = reverse_lazy("noauth:code")
@@ -119,11 +143,18 @@ class LogInView(FormView):
     def form_valid(self, form):
         email = normalize_email(form.cleaned_data["email"])
         user = self.get_user(email)
-        if not user:
+        if not user and getattr(settings, "NOAUTH_DEFER_USER_CREATION", True):
+            user = User(username=email, email=email)
+        elif not user:
             user = self.create_user(email)
 
-        self.success_url += f"?email={urllib.parse.quote_plus(user.username)}"
-        if AuthCode.send_auth_code(user, self.request.build_absolute_uri(reverse("noauth:code")), self.request.GET.get("next")):
+        next_page = get_safe_next_page(self.request)
+        # At most one code is sent per step, so if one was already sent, it was sent in this step too.
+        step = AuthCode.get_current_step()
+        self.success_url += f"?email={urllib.parse.quote_plus(user.username)}&step={step}"
+        if next_page:
+            self.success_url += f"&next={urllib.parse.quote_plus(next_page)}"
+        if AuthCode.send_auth_code(user, self.request.build_absolute_uri(reverse("noauth:code")), next_page, step):
             return super().form_valid(form)
         else:
             messages.add_message(
@@ -132,9 +163,8 @@ class LogInView(FormView):
             return HttpResponseRedirect(self.success_url)
 
     def create_user(self, email):
-        # password should never be used by a user to log in. Just make it long and random.
-        password = "".join(choice(string.ascii_letters + string.digits) for i in range(50))
-        return User.objects.create_user(email, email, password)
+        # Users never log in with a password, so give them an unusable one rather than hashing a random one.
+        return User.objects.create_user(email, email, None)
 
     def get_user(self, email):
         try:
@@ -205,9 +235,7 @@ class UserProfileView(FormView, ProtectedView):
             html_template = "username-pending-change-email.html"
 
             subject, to = (_(f"Your requested {settings.SITE_NAME} email change"), current_username)
-            msg = EmailMultiAlternatives(subject, render_to_string(template, email_context), None, [to])
-            msg.attach_alternative(render_to_string(html_template, email_context), "text/html")
-            msg.send()
+            OutboundEmail.enqueue(subject, [to], template, html_template, email_context)
 
             messages.add_message(
                 self.request, messages.SUCCESS, _("Your changes were saved. Check your email to complete username change.")
@@ -254,9 +282,7 @@ class ConfirmUsernameChangeView(FormView, ProtectedView):
         html_template = "username-changed-email.html"
 
         subject, to = (_(f"Your {settings.SITE_NAME} email has changed"), current_username)
-        msg = EmailMultiAlternatives(subject, render_to_string(template, email_context), None, [to])
-        msg.attach_alternative(render_to_string(html_template, email_context), "text/html")
-        msg.send()
+        OutboundEmail.enqueue(subject, [to], template, html_template, email_context)
 
         previous_emails = user.previous_emails
         previous_emails.append(current_username)
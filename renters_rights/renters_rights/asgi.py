@@ -0,0 +1,25 @@
+"""
+ASGI config for renters-rights project.
+
+This module contains the ASGI application used by ASGI servers, like gunicorn with
+uvicorn workers (see gunicorn.conf.py). It should expose a module-level variable
+named ``application``.
+
+The public pages are async views, so under ASGI a slow client waiting on a page
+doesn't tie up a worker thread; everything else runs in a thread, as under WSGI.
+
+"""
+
+import os
+from os.path import abspath, dirname
+from sys import path
+
+from django.core.asgi import get_asgi_application
+
+SITE_ROOT = dirname(dirname(abspath(__file__)))
+path.append(SITE_ROOT)
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "renters_rights.settings.production")
+
+
+application = get_asgi_application()
@@ -76,6 +76,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "django.contrib.sites",
     "django.contrib.flatpages",
+    "django.contrib.postgres",
     "localflavor",
     "modeltranslation",
     "maintenance_mode",
@@ -97,7 +98,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "maintenance_mode.middleware.MaintenanceModeMiddleware",
     "rules.middleware.TurbolinksMiddleware",
-    "django.contrib.flatpages.middleware.FlatpageFallbackMiddleware",
+    "rules.middleware.FlatpageFallbackMiddleware",
 ]
 
 ROOT_URLCONF = "renters_rights.urls"
@@ -110,8 +111,10 @@ TEMPLATES = [
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
+                "django.template.context_processors.i18n",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "rules.context_processors.content_version",
             ]
         },
         "APP_DIRS": True,
@@ -134,6 +137,37 @@ DATABASES = {
     }
 }
 
+
+def database_connection_settings():
+    """Connection settings for a Postgres database, from the environment.
+
+    DB_CONN_MAX_AGE: seconds to keep a connection open between requests. 0 closes it after every request.
+    DB_CONN_HEALTH_CHECKS: check a kept connection still works before reusing it, so a restarted database doesn't fail
+      the next request.
+
+    Returns: a dict to update a DATABASES entry with.
+    """
+    return {
+        "CONN_MAX_AGE": str_to_int(get_env_variable("DB_CONN_MAX_AGE", 600)),
+        "CONN_HEALTH_CHECKS": str_to_bool(get_env_variable("DB_CONN_HEALTH_CHECKS", True)),
+    }
+
+
+DATABASES["default"].update(database_connection_settings())
+# Reads can go to a read replica, configured as DATABASES[DATABASE_REPLICA]. Requests read the public content from it,
+# and anonymous GET requests read everything but users and sessions from it (with lib.middleware.ReplicaMiddleware).
+# After a request writes, its visitor reads from the primary for DATABASE_REPLICA_PIN_SECONDS. If the replica can't be
+# reached, reads go to the primary and the replica is tried again after DATABASE_REPLICA_RETRY_SECONDS. Anything cached
+# per content version, and everything outside of requests (like management commands), is read from the primary.
+DATABASE_ROUTERS = ["lib.db.ReplicaRouter"]
+DATABASE_REPLICA = "replica"
+DATABASE_REPLICA_APPS = ["rules", "flatpages", "sites"]
+DATABASE_PRIMARY_APPS = ["auth", "contenttypes", "noauth", "sessions"]
+DATABASE_REPLICA_PIN_SECONDS = str_to_int(get_env_variable("DATABASE_REPLICA_PIN_SECONDS", 10))
+DATABASE_REPLICA_RETRY_SECONDS = str_to_int(get_env_variable("DATABASE_REPLICA_RETRY_SECONDS", 30))
+# Add how long each request spent on queries, and how many connections it opened, to a Server-Timing header.
+DB_SERVER_TIMING = str_to_bool(get_env_variable("DB_SERVER_TIMING", "false"))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -161,6 +195,8 @@ STATIC_URL = "/s/"
 STATICFILES_DIRS = [os.path.join(BASE_DIR, "public")]
 STATIC_ROOT = os.path.join(BASE_DIR, "public_collected")
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+# Where `manage.py bake` writes pre-rendered public pages.
+BAKE_ROOT = os.path.join(BASE_DIR, "baked")
 
 LOCALE_PATHS = [os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "locale"))]
 
@@ -168,6 +204,15 @@ LOCALE_PATHS = [os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "l
 DEFAULT_FROM_EMAIL = get_env_variable("DEFAULT_FROM_EMAIL", "no-reply@renterhaven.com")
 AUTH_USER_MODEL = "noauth.User"
 NOAUTH_CODE_TTL_MINUTES = 30
+# Only create users when they first use a log in code, so abandoned or mistyped addresses never reach the database.
+NOAUTH_DEFER_USER_CREATION = True
+
+# Outbound email is queued and sent by `manage.py send_queued_email`. Failed sends are retried this many times, waiting
+# EMAIL_QUEUE_RETRY_SECONDS after the first failure and twice as long after each one that follows.
+EMAIL_QUEUE_MAX_ATTEMPTS = str_to_int(get_env_variable("EMAIL_QUEUE_MAX_ATTEMPTS", 5))
+EMAIL_QUEUE_RETRY_SECONDS = str_to_int(get_env_variable("EMAIL_QUEUE_RETRY_SECONDS", 60))
+# How long a worker has to send the emails it claimed before another worker may pick them up.
+EMAIL_QUEUE_LEASE_SECONDS = str_to_int(get_env_variable("EMAIL_QUEUE_LEASE_SECONDS", 600))
 
 LOGGING = {
     "version": 1,
@@ -176,6 +221,7 @@ LOGGING = {
     "loggers": {
         "django": {"handlers": ["console"], "level": os.getenv("DJANGO_LOG_LEVEL", "INFO"), "propagate": True},
         "rules": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
+        "noauth": {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO")},
     },
 }
 
@@ -191,8 +237,12 @@ MODELTRANSLATION_FALLBACK_LANGUAGES = ("en",)
 # Good for test sites, pre-release, etc.
 BASIC_AUTH_USERNAME = os.getenv("BASIC_AUTH_USERNAME", "")
 BASIC_AUTH_PASSWORD = os.getenv("BASIC_AUTH_PASSWORD", "")
+# Static files are always served without basic auth, as are any paths listed here (like a load balancer's health check).
+BASIC_AUTH_EXEMPT_PATHS = []
 if BASIC_AUTH_USERNAME and BASIC_AUTH_PASSWORD:
     MIDDLEWARE.insert(0, "lib.middleware.BasicAuthMiddleware")
+if DB_SERVER_TIMING:
+    MIDDLEWARE.insert(0, "lib.middleware.DatabaseTimingMiddleware")
 
 MAX_THREAD_POOL_WORKERS = (
     str_to_int(os.getenv("MAX_THREAD_POOL_WORKERS", None)) if os.getenv("MAX_THREAD_POOL_WORKERS", None) else None
@@ -204,8 +254,30 @@ MAX_MOVE_IN_PICTURES_PER_UNIT = os.getenv("MAX_MOVE_IN_PICTURES_PER_UNIT", 12)
 MAX_MOVE_OUT_PICTURES_PER_UNIT = os.getenv("MAX_MOVE_OUT_PICTURES_PER_UNIT", 12)
 
 CACHE_TIMEOUT = get_env_variable("CACHE_TIMEOUT", 86400)
+# Set by Heroku's dyno metadata. Cached content is versioned per release so it never outlives the templates it was
+# rendered from.
+RELEASE_VERSION = os.getenv("HEROKU_RELEASE_VERSION", "")
 CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "TIMEOUT": CACHE_TIMEOUT}}
 AWS_QUERYSTRING_EXPIRE = CACHE_TIMEOUT + 30
 
+# Sessions are only created when someone logs in: CSRF tokens and the language live in their own cookies, and flashed
+# messages are stored in a cookie, so anonymous visitors never cause session reads or writes.
+# SESSION_BACKEND picks where sessions are stored:
+#   db: one row per session. Run `manage.py expire_sessions` regularly to delete expired rows.
+#   cached_db: the database, with reads served from the cache.
+#   cache: the cache only. Fastest, but sessions are lost if the cache is flushed or evicts them.
+#   signed_cookies: the browser, signed with SECRET_KEY. No server storage, but logging out can't revoke a copied cookie.
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_BACKEND = get_env_variable("SESSION_BACKEND", "db")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_COOKIE_AGE = str_to_int(get_env_variable("SESSION_COOKIE_AGE", 60 * 60 * 24 * 14))
+SESSION_COOKIE_HTTPONLY = True
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
 # APP SETTINGS
 LANGUAGES = [("es", _("Spanish")), ("en", _("English"))]
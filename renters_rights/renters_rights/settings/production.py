@@ -2,12 +2,19 @@
 
 from __future__ import absolute_import
 
+import dj_database_url
 import django_heroku
 
 from .base import *
 
 django_heroku.settings(locals(), staticfiles=False)
 DATABASES["default"]["ENGINE"] = "django.db.backends.postgresql"
+# django_heroku replaces the default database, so its connection settings have to be applied again.
+DATABASES["default"].update(database_connection_settings())
+if os.environ.get("DATABASE_REPLICA_URL"):
+    DATABASES[DATABASE_REPLICA] = dj_database_url.parse(os.environ["DATABASE_REPLICA_URL"], ssl_require=True)
+    DATABASES[DATABASE_REPLICA].update(database_connection_settings(), TEST={"MIRROR": "default"})
+    MIDDLEWARE.insert(MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1, "lib.middleware.ReplicaMiddleware")
 
 DEBUG = str_to_bool(os.environ.get("DJANGO_DEBUG", False))
 
@@ -15,11 +22,17 @@ DEBUG = str_to_bool(os.environ.get("DJANGO_DEBUG", False))
 ALLOWED_HOSTS = get_env_variable("ALLOWED_HOSTS").split(",")
 SECURE_SSL_REDIRECT = str_to_bool(get_env_variable("SECURE_SSL_REDIRECT", True))
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+# Heroku's router appends the client's address to X-Forwarded-For, so rate limits use the last address in it.
+RATELIMIT_USE_X_FORWARDED_FOR = True
 ########## END HOST CONFIGURATION
 
 ########## EMAIL CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#email-backend
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# SMTP, but connections are kept open and reused rather than reconnecting and logging in for every message.
+EMAIL_BACKEND = "lib.mail.PooledEmailBackend"
+EMAIL_POOL_SIZE = int(get_env_variable("EMAIL_POOL_SIZE", 4))
+EMAIL_POOL_MAX_IDLE_SECONDS = int(get_env_variable("EMAIL_POOL_MAX_IDLE_SECONDS", 60))
+EMAIL_MAX_MESSAGES_PER_CONNECTION = int(get_env_variable("EMAIL_MAX_MESSAGES_PER_CONNECTION", 100))
 
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#email-host
 EMAIL_HOST = get_env_variable("EMAIL_HOST")
@@ -45,19 +58,40 @@ SERVER_EMAIL = EMAIL_HOST_USER
 ########## END EMAIL CONFIGURATION
 
 ########## CACHE CONFIGURATION
+# Recently used values are kept in each process for CACHE_LOCAL_TIMEOUT seconds, in front of memcached, whose
+# connections are shared by every thread in the process.
 CACHES = {
     "default": {
-        "BACKEND": "django_bmemcached.memcached.BMemcached",
+        "BACKEND": "lib.cache.TieredCache",
+        "LOCATION": "memcached",
+        "TIMEOUT": CACHE_TIMEOUT,
+        "OPTIONS": {
+            "LOCAL_TIMEOUT": int(get_env_variable("CACHE_LOCAL_TIMEOUT", 5)),
+            "LOCAL_MAX_ENTRIES": int(get_env_variable("CACHE_LOCAL_MAX_ENTRIES", 1000)),
+        },
+    },
+    "memcached": {
+        "BACKEND": "lib.memcached.PooledBMemcached",
         "LOCATION": os.environ.get("MEMCACHEDCLOUD_SERVERS").split(","),
         "TIMEOUT": CACHE_TIMEOUT,
         "OPTIONS": {
             "username": os.environ.get("MEMCACHEDCLOUD_USERNAME"),
             "password": os.environ.get("MEMCACHEDCLOUD_PASSWORD"),
+            "POOL_SIZE": int(get_env_variable("MEMCACHED_POOL_SIZE", 8)),
         },
-    }
+    },
 }
 ########## END CACHE CONFIGURATION
 
+########## SESSION CONFIGURATION
+# Sessions are kept in the database, but read from memcached.
+SESSION_BACKEND = get_env_variable("SESSION_BACKEND", "cached_db")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+# A logged out session must be gone everywhere at once, so sessions skip the in-process cache.
+SESSION_CACHE_ALIAS = "memcached"
+SESSION_COOKIE_SECURE = SECURE_SSL_REDIRECT
+########## END SESSION CONFIGURATION
+
 ########## SECRET CONFIGURATION
 # See: https://docs.djangoproject.com/en/dev/ref/settings/#secret-key
 SECRET_KEY = get_env_variable("SECRET_KEY")
@@ -1,16 +1,17 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.flatpages import views
 from django.urls import include, path
 
+from rules.flatpages import flatpage
+
 admin.site.site_header = "Renter Haven Administration"
 
 urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
     path("", include("rules.urls")),
     path("admin/", admin.site.urls),
-    path("<path:url>", views.flatpage),
+    path("<path:url>", flatpage),
 ]
 
 if settings.DEBUG:
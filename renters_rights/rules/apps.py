@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ItemsConfig(AppConfig):
     name = "rules"
+
+    def ready(self):
+        from rules import signals  # noqa: F401
@@ -0,0 +1,56 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+WORD_RE = re.compile(r"[\w.]+")
+
+
+def normalize(text):
+    """Lowercases text and strips accents and section signs, so "§ 156.153" matches "156.1" and "Baño" matches "bano"."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c)).replace("§", " ")
+
+
+def tokenize(text):
+    return [word.strip(".") for word in WORD_RE.findall(normalize(text)) if word.strip(".")]
+
+
+class PrefixIndex:
+    """A sorted array of (token, position) pairs that finds the rules with words starting with each typed prefix."""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.entries = sorted({(token, position) for position, rule in enumerate(self.rules) for token in self._tokens(rule)})
+        self.tokens = [token for token, _ in self.entries]
+
+    @staticmethod
+    def _tokens(rule):
+        yield from tokenize(rule.title)
+        for ordinance in rule.ordinances:
+            yield from tokenize(ordinance)
+
+    def _positions(self, prefix):
+        positions = set()
+        for i in range(bisect_left(self.tokens, prefix), len(self.tokens)):
+            if not self.tokens[i].startswith(prefix):
+                break
+            positions.add(self.entries[i][1])
+        return positions
+
+    def search(self, text, limit=10):
+        """Finds rules with a word starting with every word in the text, in catalog order.
+
+        Args:
+          text: what the user has typed so far.
+          limit: the most rules to return.
+
+        Returns: a list of catalog rules.
+        """
+        prefixes = tokenize(text)
+        if not prefixes:
+            return []
+
+        positions = self._positions(prefixes[0])
+        for prefix in prefixes[1:]:
+            positions &= self._positions(prefix)
+        return [self.rules[position] for position in sorted(positions)[:limit]]
@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+
+from lib.db import use_primary
+
+
+def _version_key(name):
+    return f"rules:{name}-version:{settings.RELEASE_VERSION}"
+
+
+def _get_version(name):
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 1 so an evicted version never collides with one that was used before.
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(name):
+    try:
+        return cache.incr(_version_key(name))
+    except ValueError:
+        return _get_version(name)
+
+
+def get_content_version():
+    """Gets the current version of the rule content.
+    The version changes whenever a Rule, RuleGroup or Ordinance changes, so anything derived from that content can be
+    keyed on it and shared between processes without going stale.
+
+    Returns: the current content version.
+    """
+    return _get_version("content")
+
+
+def bump_content_version():
+    """Moves the rule content to a new version, orphaning everything keyed on the old one.
+
+    Returns: the new content version.
+    """
+    return _bump_version("content")
+
+
+def get_flatpage_version():
+    """Gets the current version of the flat pages, which changes whenever a FlatPage or the sites it's on change.
+
+    Returns: the current flat page version.
+    """
+    return _get_version("flatpage")
+
+
+def bump_flatpage_version():
+    """Moves the flat pages to a new version, orphaning everything keyed on the old one.
+
+    Returns: the new flat page version.
+    """
+    return _bump_version("flatpage")
+
+
+def get_content_last_modified():
+    """Gets the time the rule content was last modified. It's only queried once per content version.
+
+    Returns: the latest modified_at of any Rule, RuleGroup or Ordinance, or None if there aren't any.
+    """
+    from rules.models import Ordinance, Rule, RuleGroup
+
+    def latest_modified_at():
+        with use_primary():
+            dates = [m.objects.aggregate(latest=Max("modified_at"))["latest"] for m in (Ordinance, Rule, RuleGroup)]
+        return max((d for d in dates if d), default=None)
+
+    return cache.get_or_set(get_content_last_modified_key(get_content_version()), latest_modified_at, None)
+
+
+def get_content_last_modified_key(version):
+    return f"rules:content-last-modified:{version}"
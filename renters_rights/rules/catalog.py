@@ -0,0 +1,116 @@
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Tuple
+
+from django.urls import reverse
+from django.utils import translation
+from django.utils.functional import cached_property
+
+from lib.db import use_primary
+from rules.autocomplete import PrefixIndex
+from rules.cache import get_content_version
+from rules.models import Rule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogRule:
+    title: str
+    slug: str
+    url: str
+    ordinances: Tuple[str, ...]
+
+    def __str__(self):
+        return self.title
+
+
+@dataclass(frozen=True)
+class CatalogGroup:
+    title: str
+    slug: str
+    rules: Tuple[CatalogRule, ...]
+
+    def __str__(self):
+        return self.title
+
+
+class RuleCatalog:
+    """A read-only snapshot of every rule, grouped and sorted for display, with titles resolved for one language."""
+
+    def __init__(self, language, version, groups):
+        self.language = language
+        self.version = version
+        self.groups = groups
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    @property
+    def rules(self):
+        return [rule for group in self.groups for rule in group.rules]
+
+    @cached_property
+    def prefix_index(self):
+        """An index of rule titles and ordinance numbers for autocomplete, built the first time it's needed."""
+        return PrefixIndex(self.rules)
+
+    @classmethod
+    def build(cls, language, version):
+        """Builds a catalog from the database.
+
+        Args:
+          language: the language code to resolve translated fields in.
+          version: the content version the catalog is being built for.
+
+        Returns: a new RuleCatalog.
+        """
+        with translation.override(language):
+            rules_by_group = {}
+            for rule in Rule.objects.select_related("rule_group").prefetch_related("ordinance").order_by("pk"):
+                rules_by_group.setdefault(rule.rule_group, []).append(
+                    CatalogRule(
+                        title=rule.title,
+                        slug=rule.slug,
+                        url=reverse("rule", args=[rule.slug]),
+                        ordinances=tuple(o.ordinance for o in sorted(rule.ordinance.all(), key=lambda o: o.pk)),
+                    )
+                )
+
+        groups = tuple(
+            CatalogGroup(title=group.title, slug=group.slug, rules=tuple(rules))
+            for group, rules in sorted(rules_by_group.items(), key=lambda item: item[0].title)
+        )
+        return cls(language, version, groups)
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(language=None):
+    """Gets the rule catalog for a language, building it only if the rule content has changed since it was last built.
+
+    Args:
+      language: the language code to get the catalog for. Defaults to the active language.
+
+    Returns: a RuleCatalog.
+    """
+    language = language or translation.get_language()
+    version = get_content_version()
+
+    catalog = _catalogs.get(language)
+    if catalog is None or catalog.version != version:
+        with _catalogs_lock:
+            catalog = _catalogs.get(language)
+            if catalog is None or catalog.version != version:
+                logger.debug("Building %s rule catalog for content version %s", language, version)
+                with use_primary():
+                    catalog = _catalogs[language] = RuleCatalog.build(language, version)
+    return catalog
+
+
+def clear_catalogs():
+    with _catalogs_lock:
+        _catalogs.clear()
@@ -0,0 +1,10 @@
+from django.utils.functional import SimpleLazyObject
+
+from rules.cache import get_content_version
+
+
+def content_version(request):
+    """Adds the rule content version to the context, so templates can key cached fragments on it, e.g.
+    `{% cache None rule_list LANGUAGE_CODE content_version %}`. The version is only looked up if a template uses it.
+    """
+    return {"content_version": SimpleLazyObject(get_content_version)}
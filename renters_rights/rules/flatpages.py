@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.flatpages.views import render_flatpage
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.cache import cache
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.utils.translation import get_language
+
+from lib.db import use_primary
+from rules.cache import get_flatpage_version
+from rules.mixins import CachedPageMixin
+
+logger = logging.getLogger(__name__)
+
+
+class FlatPageIndex:
+    """The URLs of every flat page, by site, for one flat page version.
+
+    Args:
+      version: the flat page version the index was built for.
+      sites: a dict of {url: registration required} dicts by site ID.
+    """
+
+    def __init__(self, version, sites):
+        self.version = version
+        self.sites = sites
+
+    @classmethod
+    def build(cls, version):
+        sites = {}
+        for site_id, url, registration_required in FlatPage.sites.through.objects.values_list(
+            "site_id", "flatpage__url", "flatpage__registration_required"
+        ):
+            sites.setdefault(site_id, {})[url] = registration_required
+        return cls(version, sites)
+
+    def get_urls(self, site_id):
+        return self.sites.get(site_id, {})
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_flatpage_index():
+    """Gets the flat page index, building it only if the flat pages have changed since it was last built.
+
+    Returns: a FlatPageIndex.
+    """
+    global _index
+    version = get_flatpage_version()
+
+    index = _index
+    if index is None or index.version != version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != version:
+                logger.debug("Building flat page index for flat page version %s", version)
+                with use_primary():
+                    index = _index = FlatPageIndex.build(version)
+    return index
+
+
+def clear_flatpage_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def flatpage(request, url):
+    """A drop-in replacement for django.contrib.flatpages.views.flatpage.
+
+    URLs that aren't flat pages are rejected from an in-memory index without a query, and public flat pages are cached
+    per URL, language and flat page version for anonymous visitors.
+    """
+    if not url.startswith("/"):
+        url = "/" + url
+    site_id = get_current_site(request).id
+    index = get_flatpage_index()
+    urls = index.get_urls(site_id)
+
+    if url not in urls:
+        if not url.endswith("/") and settings.APPEND_SLASH and url + "/" in urls:
+            return HttpResponsePermanentRedirect(f"{request.path}/")
+        raise Http404
+
+    if urls[url] or not CachedPageMixin.is_cacheable_request(request):
+        return render_flatpage(request, get_object_or_404(FlatPage, url=url, sites=site_id))
+
+    language = get_language()
+    url_hash = hashlib.md5(url.encode()).hexdigest()
+    etag = quote_etag(f"{index.version}-{site_id}-{language}-{url_hash}")
+    key = f"rules:flatpage:{index.version}:{site_id}:{language}:{url_hash}"
+    response = cache.get(key)
+    if response is None:
+        with use_primary():
+            response = render_flatpage(request, get_object_or_404(FlatPage, url=url, sites=site_id))
+        if response.status_code != 200:
+            return response
+        cache.set(key, response, None)
+
+    response = get_conditional_response(request, etag=etag, response=response)
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Cookie",))
+    return response
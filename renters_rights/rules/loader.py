@@ -0,0 +1,246 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+import yaml
+from django.apps import apps
+from django.db import transaction
+
+from rules.cache import bump_content_version
+from rules.catalog import clear_catalogs
+from rules.models import Ordinance, Rule, RuleGroup
+from rules.search import update_search_vectors
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader
+
+logger = logging.getLogger(__name__)
+
+# Models that can be loaded from rule fixtures, in the order they have to be loaded in.
+FIXTURE_MODELS = {"rules.ordinance": Ordinance, "rules.rulegroup": RuleGroup, "rules.rule": Rule}
+# Fixture fields that don't describe content, and so don't count as changes.
+UNHASHED_FIELDS = ("created_at", "modified_at")
+
+
+def get_fixture_paths():
+    return sorted(glob.glob(os.path.join(apps.get_app_config("rules").path, "fixtures", "*.yaml")))
+
+
+def read_fixtures(paths):
+    """Reads fixture files, using libyaml if it's available. Each fixture is a single YAML list, which PyYAML can only
+    build whole, so files are parsed one at a time rather than streamed object by object.
+
+    Args:
+      paths: the fixture files to read.
+
+    Returns: a dict of fixture objects by model label. Each object's "source" is the name of the file it was read from.
+    """
+    objects = defaultdict(list)
+    for path in paths:
+        with open(path, "rb") as fixture_file:
+            for o in yaml.load(fixture_file, Loader=SafeLoader) or []:
+                if o["model"] not in FIXTURE_MODELS:
+                    raise ValueError(f"{path} contains a {o['model']}, which can't be loaded as rule content.")
+                objects[o["model"]].append({**o, "source": get_fixture_name(path)})
+    return objects
+
+
+def check_references(fixture_rules, ordinance_slugs, group_slugs):
+    """Checks every rule only refers to rule groups and ordinances in the fixtures being loaded. Primary keys in fixtures
+    don't match the database's, so references can't be looked up there.
+
+    Raises: ValueError naming the first reference that can't be resolved.
+    """
+    for o in fixture_rules:
+        fields = o["fields"]
+        missing = [("rule group", fields["rule_group"])] if fields["rule_group"] not in group_slugs else []
+        missing += [("ordinance", pk) for pk in fields.get("ordinance", []) if pk not in ordinance_slugs]
+        if missing:
+            kind, pk = missing[0]
+            raise ValueError(
+                f"Rule {fields['slug']} in {o['source']} refers to {kind} {pk}, which isn't in the fixtures being loaded."
+            )
+
+
+def get_fixture_name(path):
+    """Returns: the name objects loaded from a fixture file are recorded under. Only the file name is used, so the
+    fixtures can be loaded from a different directory on each machine."""
+    return os.path.basename(path)
+
+
+def content_hash(fields):
+    """Hashes the content of a fixture object. References to other objects must already be replaced with their slugs,
+    since primary keys can differ between the fixture and the database."""
+    content = {k: v for k, v in fields.items() if k not in UNHASHED_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LoadResult:
+    def __init__(self):
+        self.created = self.updated = self.deleted = self.unchanged = self.kept = 0
+
+    @property
+    def changed(self):
+        return bool(self.created or self.updated or self.deleted)
+
+    def __str__(self):
+        result = f"{self.created} created, {self.updated} updated, {self.deleted} deleted, {self.unchanged} unchanged"
+        if self.kept:
+            result += f", {self.kept} kept because other rules still use them"
+        return result
+
+
+class RuleLoader:
+    """Loads rule fixtures in bulk, in one transaction. Ordinances, rule groups and rules are matched to existing rows
+    by slug, and a hash of each object's content and the name of the fixture it came from are stored with it.
+
+    In sync mode, objects whose content hash hasn't changed since they were last loaded aren't written at all, and
+    objects that were loaded from one of the given fixture files before but are no longer in it are deleted. Objects
+    created in the admin or loaded from other fixture files are never deleted, and neither are rule groups and
+    ordinances that those rules still use.
+    """
+
+    def __init__(self, sync=False):
+        self.sync = sync
+        self.results = {label: LoadResult() for label in FIXTURE_MODELS}
+
+    def load(self, paths=None):
+        """Loads fixtures.
+
+        Args:
+          paths: the fixture files to load. Defaults to every fixture in the rules app.
+
+        Returns: a dict of LoadResults by model label.
+        """
+        paths = paths or get_fixture_paths()
+        start = time.perf_counter()
+        objects = read_fixtures(paths)
+        logger.debug("Read fixtures in %.3fs", time.perf_counter() - start)
+
+        # A fixture's primary keys only mean something within the fixtures, so references are resolved against them alone.
+        ordinance_slugs = {o["pk"]: o["fields"]["slug"] for o in objects["rules.ordinance"]}
+        group_slugs = {o["pk"]: o["fields"]["slug"] for o in objects["rules.rulegroup"]}
+        check_references(objects["rules.rule"], ordinance_slugs, group_slugs)
+
+        def rule_content(fields):
+            return {
+                **fields,
+                "rule_group": group_slugs[fields["rule_group"]],
+                "ordinance": sorted(ordinance_slugs[pk] for pk in fields.get("ordinance", [])),
+            }
+
+        with transaction.atomic():
+            ordinance_pks, written_ordinance_pks = self._write(Ordinance, objects["rules.ordinance"])
+            group_pks, _ = self._write(RuleGroup, objects["rules.rulegroup"])
+            rule_pks, written_rule_pks = self._write(
+                Rule, objects["rules.rule"], {"rule_group": group_pks}, content=rule_content
+            )
+            self._replace_ordinance_links(objects["rules.rule"], rule_pks, ordinance_pks, written_rule_pks)
+
+            if self.sync:
+                sources = {get_fixture_name(path) for path in paths}
+                for label in reversed(FIXTURE_MODELS):
+                    self._delete_missing(label, objects[label], sources)
+
+            if any(result.changed for result in self.results.values()):
+                # Bulk operations don't send signals, so do what the signal receivers would have done.
+                affected_rule_pks = set(written_rule_pks)
+                affected_rule_pks.update(
+                    Rule.ordinance.through.objects.filter(ordinance_id__in=written_ordinance_pks).values_list(
+                        "rule_id", flat=True
+                    )
+                )
+                update_search_vectors(list(affected_rule_pks))
+                transaction.on_commit(bump_content_version)
+                transaction.on_commit(clear_catalogs)
+
+        return self.results
+
+    def _write(self, model, fixture_objects, foreign_keys=None, content=lambda fields: fields):
+        """Inserts or updates fixture objects in one statement, matching existing rows on slug.
+
+        Returns: a dict of database primary keys by fixture primary key, and the primary keys of the rows written.
+        """
+        result = self.results[model._meta.label_lower]
+        existing = {
+            slug: (h, source) for slug, h, source in model.objects.values_list("slug", "content_hash", "source_fixture")
+        }
+        m2m_names = {f.name for f in model._meta.many_to_many}
+
+        instances = []
+        for o in fixture_objects:
+            h = content_hash(content(o["fields"]))
+            slug = o["fields"]["slug"]
+            if slug not in existing:
+                result.created += 1
+            elif self.sync and existing[slug] == (h, o["source"]):
+                result.unchanged += 1
+                continue
+            else:
+                result.updated += 1
+
+            fields = {k: v for k, v in o["fields"].items() if k not in m2m_names}
+            for name, pks in (foreign_keys or {}).items():
+                fields[f"{name}_id"] = pks[fields.pop(name)]
+            instances.append(model(content_hash=h, source_fixture=o["source"], **fields))
+
+        update_fields = [
+            f.name for f in model._meta.concrete_fields if not f.primary_key and f.name not in ("slug", "created_at")
+        ]
+        model.objects.bulk_create(instances, update_conflicts=True, unique_fields=["slug"], update_fields=update_fields)
+
+        slugs = {o["fields"]["slug"] for o in fixture_objects}
+        pks_by_slug = dict(model.objects.filter(slug__in=slugs).values_list("slug", "pk"))
+        pks = {o["pk"]: pks_by_slug[o["fields"]["slug"]] for o in fixture_objects}
+        return pks, [pks_by_slug[i.slug] for i in instances]
+
+    @staticmethod
+    def _replace_ordinance_links(fixture_rules, rule_pks, ordinance_pks, written_rule_pks):
+        written_rule_pks = set(written_rule_pks)
+        through = Rule.ordinance.through
+        through.objects.filter(rule_id__in=written_rule_pks).delete()
+        through.objects.bulk_create(
+            [
+                through(rule_id=rule_pks[o["pk"]], ordinance_id=ordinance_pks[ordinance_pk])
+                for o in fixture_rules
+                if rule_pks[o["pk"]] in written_rule_pks
+                for ordinance_pk in o["fields"].get("ordinance", [])
+            ]
+        )
+
+    def _delete_missing(self, label, fixture_objects, sources):
+        """Deletes objects that were loaded from one of the given fixture files, but aren't in them anymore.
+
+        Rules are deleted first, so any rule group or ordinance that still has rules is used by a rule from the admin or
+        another fixture file. Those are kept, rather than deleting the rules along with them.
+        """
+        slugs = {o["fields"]["slug"] for o in fixture_objects}
+        model = FIXTURE_MODELS[label]
+        missing = model.objects.filter(source_fixture__in=sources).exclude(slug__in=slugs)
+        if model is not Rule:
+            in_use = sorted(set(missing.filter(rule__isnull=False).values_list("slug", flat=True)))
+            for slug in in_use:
+                logger.warning("Not deleting %s %s, since other rules still use it", model._meta.verbose_name, slug)
+            self.results[label].kept = len(in_use)
+            missing = missing.filter(rule__isnull=True)
+
+        _, deleted = missing.delete()
+        self.results[label].deleted = deleted.get(model._meta.label, 0)
+
+
+def load_rules(paths=None, sync=False):
+    """Loads rule fixtures. See RuleLoader.
+
+    Args:
+      paths: the fixture files to load. Defaults to every fixture in the rules app.
+      sync: whether to only write changes, and delete objects that are no longer in the fixture files they came from.
+
+    Returns: a dict of LoadResults by model label.
+    """
+    return RuleLoader(sync=sync).load(paths)
@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.flatpages.models import FlatPage
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max
+from django.template import engines
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import translation
+
+from rules.models import Ordinance, Rule, RuleGroup
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+MANIFEST_FILE_NAME = "bake-manifest.json"
+STATIC_PAGES = ("homepage", "how-it-works", "get-help", "resources")
+
+
+class Command(BaseCommand):
+    help = (
+        "Renders every public page, in every language, to static files (with gzip and brotli variants) that can be "
+        "served without Django. Only pages whose source records changed since the last bake are rendered again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.BAKE_ROOT, help="Directory to write pages to.")
+        parser.add_argument("--force", action="store_true", help="Render every page, even if it hasn't changed.")
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        manifest_path = os.path.join(output, MANIFEST_FILE_NAME)
+        # Read the last manifest even when forcing, so pages that no longer exist are still cleaned up.
+        manifest = self.read_manifest(manifest_path)
+        templates_fingerprint = self.get_templates_fingerprint()
+        request_factory = RequestFactory(HTTP_HOST=urlparse(settings.SITE_URL).hostname)
+        start = time.perf_counter()
+
+        baked = skipped = 0
+        fingerprints = {}
+        for language, _ in settings.LANGUAGES:
+            for path, fingerprint in self.get_pages():
+                page = f"{language}:{path}"
+                fingerprint = f"{settings.RELEASE_VERSION}:{templates_fingerprint}:{fingerprint}"
+                fingerprint = hashlib.sha1(fingerprint.encode()).hexdigest()
+                fingerprints[page] = fingerprint
+
+                page_path = self.get_page_path(output, language, path)
+                if not options["force"] and manifest.get(page) == fingerprint and os.path.exists(page_path):
+                    skipped += 1
+                    continue
+
+                self.write_page(page_path, self.render(request_factory, language, path))
+                baked += 1
+
+        removed = 0
+        for page in manifest.keys() - fingerprints.keys():
+            language, path = page.split(":", 1)
+            page_path = self.get_page_path(output, language, path)
+            for file_path in (page_path, f"{page_path}.gz", f"{page_path}.br"):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            removed += 1
+
+        self.write_file(manifest_path, json.dumps(fingerprints, indent=2, sort_keys=True).encode())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Baked {baked} pages, skipped {skipped} unchanged and removed {removed} in "
+                f"{time.perf_counter() - start:.2f}s to {output}"
+            )
+        )
+
+    @staticmethod
+    def get_templates_fingerprint():
+        """Returns: a hash of the project's templates, so editing one re-bakes the pages, even without a new release."""
+        project_dir = os.path.dirname(settings.BASE_DIR)
+        template_dirs = {os.path.abspath(d) for d in engines["django"].template_dirs}
+        sha1 = hashlib.sha1()
+        for template_dir in sorted(d for d in template_dirs if d.startswith(project_dir)):
+            for root, dirs, files in sorted(os.walk(template_dir)):
+                dirs.sort()
+                for file_name in sorted(files):
+                    file_path = os.path.join(root, file_name)
+                    sha1.update(file_path.encode())
+                    with open(file_path, "rb") as f:
+                        sha1.update(f.read())
+        return sha1.hexdigest()
+
+    def get_pages(self):
+        """Gets every public page along with a fingerprint of the records it's rendered from.
+
+        Returns: an iterable of (path, fingerprint) tuples.
+        """
+        for name in STATIC_PAGES:
+            yield reverse(name), name
+
+        summary = [
+            model.objects.aggregate(count=Count("pk"), latest=Max("modified_at")) for model in (Ordinance, Rule, RuleGroup)
+        ]
+        yield reverse("rules"), repr(summary)
+
+        for rule in Rule.objects.select_related("rule_group").prefetch_related("ordinance"):
+            ordinances = sorted((o.pk, o.modified_at) for o in rule.ordinance.all())
+            yield reverse("rule", args=[rule.slug]), repr((rule.modified_at, rule.rule_group.modified_at, ordinances))
+
+        for flatpage in FlatPage.objects.filter(sites=settings.SITE_ID, registration_required=False):
+            yield flatpage.url, repr((flatpage.title, flatpage.content, flatpage.template_name))
+
+    def render(self, request_factory, language, path):
+        with translation.override(language):
+            request = request_factory.get(path)
+            request.LANGUAGE_CODE = language
+            request.user = AnonymousUser()
+            match = resolve(path)
+            response = match.func(request, *match.args, **match.kwargs)
+            if asyncio.iscoroutine(response):
+                response = async_to_sync(self.await_response)(response)
+
+        if response.status_code != 200:
+            raise CommandError(f"Rendering {path} in {language} returned {response.status_code}")
+        return response.content
+
+    @staticmethod
+    async def await_response(response):
+        return await response
+
+    @staticmethod
+    def get_page_path(output, language, path):
+        return os.path.join(output, language, path.strip("/"), "index.html")
+
+    def write_page(self, page_path, content):
+        self.write_file(page_path, content)
+        self.write_file(f"{page_path}.gz", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli:
+            self.write_file(f"{page_path}.br", brotli.compress(content))
+
+    @staticmethod
+    def write_file(file_path, content):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        temp_path = f"{file_path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, file_path)
+
+    @staticmethod
+    def read_manifest(manifest_path):
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
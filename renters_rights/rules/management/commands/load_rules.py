@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rules.loader import load_rules
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads rule fixtures in bulk, in one transaction, upserting ordinances, rule groups and rules by slug. "
+        "Much faster than loaddata for large fixtures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fixtures", nargs="*", help="Fixture files to load. Defaults to every fixture in the rules app.")
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help=(
+                "Only write objects that changed since they were last loaded, and delete objects that were loaded from "
+                "one of these fixture files but are no longer in it."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            results = load_rules(options["fixtures"], sync=options["sync"])
+        except ValueError as e:
+            raise CommandError(e)
+        for label, result in results.items():
+            self.stdout.write(f"{label}: {result}")
+        self.stdout.write(self.style.SUCCESS(f"Loaded rules in {time.perf_counter() - start:.2f}s"))
@@ -1,28 +1,72 @@
-class TurbolinksMiddleware(object):
+from django.conf import settings
+from django.http import Http404
+from django.utils.deprecation import MiddlewareMixin
+
+from lib.middleware import AsyncCapableMiddleware
+from rules.flatpages import flatpage
+
+TURBOLINKS_REDIRECT_COOKIE = "_turbolinks_redirect_to"
+TURBOLINKS_REDIRECT_COOKIE_SALT = "rules.middleware.TurbolinksMiddleware"
+# A redirect is followed straight away, so the location only needs to survive a single request.
+TURBOLINKS_REDIRECT_COOKIE_MAX_AGE = 60
+
+
+class TurbolinksMiddleware(AsyncCapableMiddleware):
     """Send the `Turbolinks-Location` header in response to a visit that was redirected,
     and Turbolinks will replace the browser's topmost history entry.
-    """
-
-    def __init__(self, get_response):
-        self.get_response = get_response
 
-    def __call__(self, request):
-        response = self.get_response(request)
+    The redirect location is carried to the next request in a short-lived signed cookie rather than the session,
+    so ordinary Turbolinks visits never load or save a session.
+    """
 
+    def process_response(self, request, response):
         is_turbolinks = request.META.get("HTTP_TURBOLINKS_REFERRER")
         is_response_redirect = response.has_header("Location")
 
         if is_turbolinks:
+            prev_location = None
+            if TURBOLINKS_REDIRECT_COOKIE in request.COOKIES:
+                prev_location = request.get_signed_cookie(
+                    TURBOLINKS_REDIRECT_COOKIE,
+                    default=None,
+                    salt=TURBOLINKS_REDIRECT_COOKIE_SALT,
+                    max_age=TURBOLINKS_REDIRECT_COOKIE_MAX_AGE,
+                )
             if is_response_redirect:
                 location = response["Location"]
-                prev_location = request.session.pop("_turbolinks_redirect_to", None)
                 if prev_location is not None:
                     # relative subsequent redirect
                     if location.startswith("."):
                         location = prev_location.split("?")[0] + location
-                request.session["_turbolinks_redirect_to"] = location
-            else:
-                if request.session.get("_turbolinks_redirect_to"):
-                    location = request.session.pop("_turbolinks_redirect_to")
-                    response["Turbolinks-Location"] = location
+                response.set_signed_cookie(
+                    TURBOLINKS_REDIRECT_COOKIE,
+                    location,
+                    salt=TURBOLINKS_REDIRECT_COOKIE_SALT,
+                    max_age=TURBOLINKS_REDIRECT_COOKIE_MAX_AGE,
+                    secure=settings.SESSION_COOKIE_SECURE,
+                    httponly=True,
+                    samesite="Lax",
+                )
+            elif TURBOLINKS_REDIRECT_COOKIE in request.COOKIES:
+                if prev_location:
+                    response["Turbolinks-Location"] = prev_location
+                response.delete_cookie(TURBOLINKS_REDIRECT_COOKIE, samesite="Lax")
         return response
+
+
+class FlatpageFallbackMiddleware(MiddlewareMixin):
+    """Like django.contrib.flatpages' fallback middleware, but 404s that aren't flat pages are recognised from the flat
+    page index, without a query.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 404:
+            return response
+        try:
+            return flatpage(request, request.path_info)
+        except Http404:
+            return response
+        except Exception:
+            if settings.DEBUG:
+                raise
+            return response
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def populate_search_vectors(apps, schema_editor):
+    from rules.search import update_search_vectors
+
+    update_search_vectors(rule_model=apps.get_model("rules", "Rule"), ordinance_model=apps.get_model("rules", "Ordinance"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("rules", "0006_ordinance_title")]
+
+    operations = [
+        migrations.AddField(
+            model_name="rule",
+            name="search_vector_en",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="rule",
+            name="search_vector_es",
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="rule",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector_en"], name="rules_rule_search__6cef01_gin"),
+        ),
+        migrations.AddIndex(
+            model_name="rule",
+            index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector_es"], name="rules_rule_search__bda0df_gin"),
+        ),
+        migrations.RunPython(populate_search_vectors, migrations.RunPython.noop),
+    ]
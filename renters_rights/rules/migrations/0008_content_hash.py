@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rules", "0007_rule_search_vectors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ordinance",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="rule",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="rulegroup",
+            name="content_hash",
+            field=models.CharField(blank=True, default="", editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rules", "0008_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ordinance",
+            name="source_fixture",
+            field=models.CharField(blank=True, default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="rule",
+            name="source_fixture",
+            field=models.CharField(blank=True, default="", editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="rulegroup",
+            name="source_fixture",
+            field=models.CharField(blank=True, default="", editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,89 @@
+import hashlib
+from calendar import timegm
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from lib.db import use_primary
+from rules.cache import get_content_last_modified, get_content_last_modified_key, get_content_version
+
+
+class CachedPageMixin:
+    """Caches whole responses for anonymous visitors, keyed on path, language and rule content version, and answers
+    conditional GETs for cached pages with 304 Not Modified. Must be used with a view whose output depends only on the
+    rule content. Works with both sync and async views.
+    """
+
+    def get_cached_page(self, request):
+        """Looks up the page for the current language and content version, and when the content last changed, in a
+        single cache round trip.
+
+        Returns: the page's cache key, ETag and last modified timestamp, and the cached response or None.
+        """
+        language = get_language()
+        version = get_content_version()
+        path_hash = hashlib.md5(request.path.encode()).hexdigest()
+        key = f"rules:page:{version}:{language}:{path_hash}"
+        last_modified_key = get_content_last_modified_key(version)
+
+        cached = cache.get_many([key, last_modified_key])
+        last_modified = cached[last_modified_key] if last_modified_key in cached else get_content_last_modified()
+        last_modified = timegm(last_modified.utctimetuple()) if last_modified else None
+        return key, quote_etag(f"{version}-{language}-{path_hash}"), last_modified, cached.get(key)
+
+    @staticmethod
+    def patch_page_response(response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified:
+            response["Last-Modified"] = http_date(last_modified)
+        # The language can come from a cookie, so shared caches must not serve one visitor's page to another.
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.async_dispatch(request, *args, **kwargs)
+        if not self.is_cacheable_request(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key, etag, last_modified, response = self.get_cached_page(request)
+        if response is None:
+            # Cached until the content changes, so it mustn't be rendered from a replica that's behind.
+            with use_primary():
+                response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response, None)
+        # Only now is the page known to exist, so a 404 is never answered with 304 Not Modified.
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+        return self.patch_page_response(response, etag, last_modified)
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        if not self.is_cacheable_request(request):
+            return await super().dispatch(request, *args, **kwargs)
+
+        # Looking the page up takes a couple of cache calls, and a query once per content version, so make them in one
+        # trip to a thread.
+        key, etag, last_modified, response = await sync_to_async(self.get_cached_page)(request)
+        if response is None:
+            with use_primary():
+                response = await super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            await cache.aset(key, response, None)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+        return self.patch_page_response(response, etag, last_modified)
+
+    @staticmethod
+    def is_cacheable_request(request):
+        """Anonymous visitors have no session, and flashed messages are stored in a cookie."""
+        return (
+            request.method in ("GET", "HEAD")
+            and settings.SESSION_COOKIE_NAME not in request.COOKIES
+            and CookieStorage.cookie_name not in request.COOKIES
+        )
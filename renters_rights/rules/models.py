@@ -1,5 +1,7 @@
 import logging
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils.text import slugify
 
@@ -14,6 +16,10 @@ class Ordinance(BaseModel):
     title = models.CharField(max_length=255)
     legal_description = models.TextField()
     url = models.URLField()
+    # Set when loaded from a fixture, so rules.loader can tell whether the fixture has changed since, and which fixture
+    # file the object came from.
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    source_fixture = models.CharField(max_length=255, blank=True, default="", editable=False)
 
     def __str__(self):
         return f"{self.ordinance} - {self.title}"
@@ -22,6 +28,8 @@ class Ordinance(BaseModel):
 class RuleGroup(BaseModel):
     title = models.CharField(max_length=50)
     slug = models.SlugField(unique=True, max_length=100)
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    source_fixture = models.CharField(max_length=255, blank=True, default="", editable=False)
 
     def __str__(self):
         return self.title
@@ -33,6 +41,14 @@ class Rule(BaseModel):
     ordinance = models.ManyToManyField(Ordinance)
     rule_group = models.ForeignKey(RuleGroup, on_delete=models.CASCADE)
     plain_description = models.TextField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)
+    source_fixture = models.CharField(max_length=255, blank=True, default="", editable=False)
+    # Maintained by rules.search.update_search_vectors whenever a rule or its ordinances change.
+    search_vector_en = SearchVectorField(null=True, editable=False)
+    search_vector_es = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [GinIndex(fields=["search_vector_en"]), GinIndex(fields=["search_vector_es"])]
 
     def __str__(self):
         return self.title
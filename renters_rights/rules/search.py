@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils.translation import get_language
+
+# Postgres text search configurations for each language in settings.LANGUAGES. Rule has a search_vector_<language>
+# field for each of them.
+SEARCH_CONFIGS = {"en": "english", "es": "spanish"}
+DEFAULT_SEARCH_LANGUAGE = "en"
+
+
+def _translated(field, language):
+    """Gets the value of a translated field, falling back the same way modeltranslation does when it's blank."""
+    languages = [language] + [lc for lc in settings.MODELTRANSLATION_FALLBACK_LANGUAGES if lc != language]
+    return Coalesce(*[NullIf(F(f"{field}_{lc}"), Value("")) for lc in languages], Value(""), output_field=TextField())
+
+
+def _search_vector(language, ordinance_model):
+    config = SEARCH_CONFIGS[language]
+    legal_descriptions = Subquery(
+        ordinance_model.objects.filter(rule=OuterRef("pk"))
+        .values("rule")
+        .annotate(text=StringAgg(_translated("legal_description", language), " "))
+        .values("text"),
+        output_field=TextField(),
+    )
+    return (
+        SearchVector(_translated("title", language), weight="A", config=config)
+        + SearchVector(_translated("plain_description", language), weight="B", config=config)
+        + SearchVector(legal_descriptions, weight="C", config=config)
+    )
+
+
+def update_search_vectors(rule_ids=None, rule_model=None, ordinance_model=None):
+    """Recomputes the stored search vectors of rules from their titles, descriptions and ordinances, in every language.
+    The model arguments let migrations pass in historical models.
+
+    Args:
+      rule_ids: the IDs of the rules to update. Defaults to all rules.
+      rule_model: the Rule model to update. Defaults to rules.models.Rule.
+      ordinance_model: the Ordinance model to read legal descriptions from. Defaults to rules.models.Ordinance.
+
+    Returns: the number of rules updated.
+    """
+    if not rule_model or not ordinance_model:
+        from rules.models import Ordinance, Rule
+
+        rule_model, ordinance_model = rule_model or Rule, ordinance_model or Ordinance
+
+    rules = rule_model.objects.all() if rule_ids is None else rule_model.objects.filter(pk__in=rule_ids)
+    return rules.update(
+        **{f"search_vector_{language}": _search_vector(language, ordinance_model) for language in SEARCH_CONFIGS}
+    )
+
+
+def search_rules(text, language=None):
+    """Searches rules in a language, best matches first.
+
+    Args:
+      text: the search terms, in web search syntax (quoted phrases, "or", and "-" to exclude words).
+      language: the language to search. Defaults to the active language.
+
+    Returns: a queryset of matching rules, annotated with their rank.
+    """
+    from rules.models import Rule
+
+    language = language if language in SEARCH_CONFIGS else get_language()
+    language = language if language in SEARCH_CONFIGS else DEFAULT_SEARCH_LANGUAGE
+    vector_field = f"search_vector_{language}"
+    query = SearchQuery(text, config=SEARCH_CONFIGS[language], search_type="websearch")
+    return (
+        Rule.objects.filter(**{vector_field: query}).annotate(rank=SearchRank(F(vector_field), query)).order_by("-rank", "pk")
+    )
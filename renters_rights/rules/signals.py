@@ -0,0 +1,54 @@
+from django.contrib.flatpages.models import FlatPage
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from rules.cache import bump_content_version, bump_flatpage_version
+from rules.catalog import clear_catalogs
+from rules.flatpages import clear_flatpage_index
+from rules.models import Ordinance, Rule, RuleGroup
+from rules.search import update_search_vectors
+
+
+@receiver(post_save, sender=Ordinance)
+@receiver(post_save, sender=RuleGroup)
+@receiver(post_save, sender=Rule)
+@receiver(post_delete, sender=Ordinance)
+@receiver(post_delete, sender=RuleGroup)
+@receiver(post_delete, sender=Rule)
+def rule_content_changed(sender, **kwargs):
+    # Until the change commits, other requests still read the old rows, and would cache them under the new version.
+    transaction.on_commit(bump_content_version)
+    transaction.on_commit(clear_catalogs)
+
+
+@receiver(m2m_changed, sender=Rule.ordinance.through)
+def rule_ordinances_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action.startswith("post_"):
+        rule_content_changed(sender)
+        # Clearing an ordinance's rules doesn't say which rules they were, so update them all.
+        update_search_vectors(pk_set if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Rule)
+def rule_saved(sender, instance, **kwargs):
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Ordinance)
+def ordinance_saved(sender, instance, **kwargs):
+    update_search_vectors(list(instance.rule_set.values_list("pk", flat=True)))
+
+
+@receiver(post_delete, sender=Ordinance)
+def ordinance_deleted(sender, instance, **kwargs):
+    # The ordinance's links to rules are already gone, so there's no telling which rules referenced it.
+    update_search_vectors()
+
+
+@receiver(post_save, sender=FlatPage)
+@receiver(post_delete, sender=FlatPage)
+@receiver(m2m_changed, sender=FlatPage.sites.through)
+def flatpage_changed(sender, **kwargs):
+    transaction.on_commit(bump_flatpage_version)
+    transaction.on_commit(clear_flatpage_index)
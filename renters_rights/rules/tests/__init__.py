@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from rules.catalog import clear_catalogs
+from rules.flatpages import clear_flatpage_index
+from rules.models import Ordinance, Rule, RuleGroup
+
+
+class RulesBaseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = RuleGroup.objects.create(title="Kitchen", slug="kitchen")
+        cls.bathroom = RuleGroup.objects.create(title="Bathroom", slug="bathroom")
+        cls.plumbing = Ordinance.objects.create(
+            ordinance="§ 156.153",
+            slug="156-153",
+            title="PLUMBING SYSTEMS AND FIXTURES",
+            legal_description_en="All plumbing fixtures shall be properly installed.",
+            legal_description_es="Todos los accesorios de plomería deberán estar debidamente instalados.",
+            url="https://example.com/156-153",
+        )
+        cls.toilet_rooms = Ordinance.objects.create(
+            ordinance="§ 156.152",
+            slug="156-152",
+            title="TOILET ROOMS",
+            legal_description_en="Toilet rooms and bathrooms shall provide privacy.",
+            url="https://example.com/156-152",
+        )
+        cls.sink = Rule.objects.create(
+            title_en="A working kitchen sink", title_es="Un fregadero que funcione", slug="sink", rule_group=cls.kitchen
+        )
+        cls.sink.ordinance.add(cls.plumbing)
+        cls.toilet = Rule.objects.create(title_en="A toilet that flushes", slug="toilet-flushes", rule_group=cls.bathroom)
+        cls.toilet.ordinance.add(cls.plumbing, cls.toilet_rooms)
+
+    def setUp(self):
+        cache.clear()
+        clear_catalogs()
+        clear_flatpage_index()
@@ -0,0 +1,62 @@
+from django.urls import reverse
+from hamcrest import assert_that, contains_exactly, empty, equal_to
+
+from rules.catalog import get_catalog
+from rules.tests import RulesBaseTestCase
+
+
+class PrefixIndexTests(RulesBaseTestCase):
+    def search(self, text, language="en"):
+        return [rule.slug for rule in get_catalog(language).prefix_index.search(text)]
+
+    def test_matches_title_word_prefixes(self):
+        assert_that(self.search("flu"), contains_exactly("toilet-flushes"))
+        assert_that(self.search("KITCH"), contains_exactly("sink"))
+
+    def test_every_word_must_match(self):
+        assert_that(self.search("a work"), contains_exactly("sink"))
+        assert_that(self.search("toilet sink"), empty())
+
+    def test_matches_ordinance_numbers(self):
+        assert_that(self.search("§ 156.15"), contains_exactly("toilet-flushes", "sink"))
+        assert_that(self.search("156.152"), contains_exactly("toilet-flushes"))
+
+    def test_matches_translated_titles_without_accents(self):
+        assert_that(self.search("fregadero", "es"), contains_exactly("sink"))
+        assert_that(self.search("fregadero"), empty())
+
+    def test_blank_text_matches_nothing(self):
+        assert_that(self.search(" § "), empty())
+
+    def test_index_is_rebuilt_when_a_rule_changes(self):
+        self.search("sink")
+        self.sink.title_en = "Hot and cold running water"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.save()
+        assert_that(self.search("runn"), contains_exactly("sink"))
+
+
+class AutocompleteViewTests(RulesBaseTestCase):
+    view_url = reverse("autocomplete")
+
+    def test_get_returns_matching_rules(self):
+        response = self.client.get(self.view_url, {"q": "toil"})
+        assert_that(
+            response.json(),
+            equal_to(
+                {
+                    "results": [
+                        {
+                            "title": "A toilet that flushes",
+                            "url": "/rules/toilet-flushes",
+                            "ordinances": ["§ 156.153", "§ 156.152"],
+                        }
+                    ]
+                }
+            ),
+        )
+
+    def test_get_is_served_without_queries(self):
+        self.client.get(self.view_url, {"q": "a"})
+        with self.assertNumQueries(0):
+            self.client.get(self.view_url, {"q": "a work"})
@@ -0,0 +1,49 @@
+from hamcrest import assert_that, contains_exactly, equal_to, is_not, same_instance
+
+from rules.catalog import get_catalog
+from rules.models import Rule
+from rules.tests import RulesBaseTestCase
+
+
+class RuleCatalogTests(RulesBaseTestCase):
+    def test_groups_are_sorted_by_title(self):
+        catalog = get_catalog("en")
+        assert_that([group.title for group in catalog.groups], contains_exactly("Bathroom", "Kitchen"))
+
+    def test_rules_are_resolved_with_slugs_urls_and_ordinances(self):
+        toilet = get_catalog("en").groups[0].rules[0]
+        assert_that(toilet.title, equal_to("A toilet that flushes"))
+        assert_that(toilet.url, equal_to("/rules/toilet-flushes"))
+        assert_that(toilet.ordinances, contains_exactly("§ 156.153", "§ 156.152"))
+
+    def test_titles_are_translated_per_language(self):
+        assert_that(get_catalog("en").groups[1].rules[0].title, equal_to("A working kitchen sink"))
+        assert_that(get_catalog("es").groups[1].rules[0].title, equal_to("Un fregadero que funcione"))
+
+    def test_untranslated_titles_fall_back_to_english(self):
+        assert_that(get_catalog("es").groups[0].rules[0].title, equal_to("A toilet that flushes"))
+
+    def test_catalog_is_served_from_memory_once_built(self):
+        catalog = get_catalog("en")
+        with self.assertNumQueries(0):
+            assert_that(get_catalog("en"), same_instance(catalog))
+
+    def test_catalog_is_rebuilt_when_a_rule_is_saved(self):
+        catalog = get_catalog("en")
+        with self.captureOnCommitCallbacks(execute=True):
+            Rule.objects.filter(pk=self.sink.pk).get().save()
+            # Until the change commits, other requests can only see the old rows.
+            assert_that(get_catalog("en"), same_instance(catalog))
+        assert_that(get_catalog("en"), is_not(same_instance(catalog)))
+
+    def test_catalog_is_rebuilt_when_ordinances_change(self):
+        catalog = get_catalog("en")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.ordinance.add(self.toilet_rooms)
+        rebuilt = get_catalog("en")
+        assert_that(rebuilt, is_not(same_instance(catalog)))
+        assert_that(rebuilt.groups[1].rules[0].ordinances, contains_exactly("§ 156.153", "§ 156.152"))
+
+    def test_catalog_is_rebuilt_when_a_rule_is_deleted(self):
+        self.toilet.delete()
+        assert_that([group.title for group in get_catalog("en").groups], contains_exactly("Kitchen"))
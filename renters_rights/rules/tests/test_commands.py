@@ -0,0 +1,76 @@
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+import mock
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.core.management import call_command
+from hamcrest import assert_that, contains_string, equal_to
+
+from rules.management.commands.bake import Command
+from rules.tests import RulesBaseTestCase
+
+
+class BakeCommandTests(RulesBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        about = FlatPage.objects.create(url="/about/", title="About", content="<p>About Renter Haven</p>")
+        about.sites.add(Site.objects.get_current())
+
+    def bake(self, *args):
+        stdout = StringIO()
+        call_command("bake", "--output", self.output.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def read_page(self, *path):
+        with open(os.path.join(self.output.name, *path, "index.html"), "rb") as f:
+            return f.read()
+
+    def test_bakes_every_page_in_every_language(self):
+        assert_that(self.bake(), contains_string("Baked 16 pages, skipped 0 unchanged and removed 0"))
+        assert_that(self.read_page("en", "rules", "sink").decode(), contains_string("A working kitchen sink"))
+        assert_that(self.read_page("es", "rules", "sink").decode(), contains_string("Un fregadero que funcione"))
+        assert_that(self.read_page("en", "about").decode(), contains_string("About Renter Haven"))
+        assert_that(self.read_page("en").decode(), contains_string("<html>"))
+
+    def test_bakes_gzipped_variants(self):
+        self.bake()
+        with open(os.path.join(self.output.name, "en", "rules", "index.html.gz"), "rb") as f:
+            assert_that(gzip.decompress(f.read()), equal_to(self.read_page("en", "rules")))
+
+    def test_rebakes_only_pages_whose_records_changed(self):
+        self.bake()
+        self.sink.title_en = "A kitchen sink with hot and cold water"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.save()
+        assert_that(self.bake(), contains_string("Baked 4 pages, skipped 12 unchanged"))
+        assert_that(
+            self.read_page("en", "rules", "sink").decode(), contains_string("with a kitchen sink with hot and cold water")
+        )
+
+    def test_removes_pages_for_deleted_records(self):
+        self.bake()
+        self.toilet.delete()
+        assert_that(self.bake(), contains_string("removed 2"))
+        assert_that(os.path.exists(os.path.join(self.output.name, "en", "rules", "toilet-flushes")), equal_to(True))
+        assert_that(
+            os.path.exists(os.path.join(self.output.name, "en", "rules", "toilet-flushes", "index.html")), equal_to(False)
+        )
+
+    def test_force_rebakes_everything(self):
+        self.bake()
+        assert_that(self.bake("--force"), contains_string("Baked 16 pages, skipped 0 unchanged"))
+
+    def test_force_removes_pages_for_deleted_records(self):
+        self.bake()
+        self.toilet.delete()
+        assert_that(self.bake("--force"), contains_string("Baked 14 pages, skipped 0 unchanged and removed 2"))
+
+    def test_rebakes_everything_when_a_template_changes(self):
+        self.bake()
+        with mock.patch.object(Command, "get_templates_fingerprint", return_value="edited"):
+            assert_that(self.bake(), contains_string("Baked 16 pages, skipped 0 unchanged"))
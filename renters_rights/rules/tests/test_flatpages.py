@@ -0,0 +1,82 @@
+from django.contrib.flatpages.models import FlatPage
+from django.contrib.sites.models import Site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from hamcrest import assert_that, contains_string, equal_to, is_not
+
+from rules.tests import RulesBaseTestCase
+
+
+class FlatPageTests(RulesBaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        site = Site.objects.get_current()
+        cls.about = FlatPage.objects.create(url="/about/", title="About", content="About Renter Haven")
+        cls.about.sites.add(site)
+        cls.private = FlatPage.objects.create(
+            url="/private/", title="Private", content="Members only", registration_required=True
+        )
+        cls.private.sites.add(site)
+
+    def test_get_renders_flatpage(self):
+        response = self.client.get("/about/")
+        assert_that(response.status_code, equal_to(200))
+        assert_that(response.content.decode(), contains_string("About Renter Haven"))
+
+    def test_get_serves_cached_flatpage_without_queries(self):
+        first = self.client.get("/about/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/about/")
+        assert_that(second.content, equal_to(first.content))
+
+    def test_get_unknown_url_returns_not_found_without_queries(self):
+        self.client.get("/about/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/wp-login.php")
+        assert_that(response.status_code, equal_to(404))
+
+    def test_get_unknown_url_under_app_returns_not_found_without_flatpage_queries(self):
+        self.client.get("/about/")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/rules/no-such-rule/extra")
+        assert_that(response.status_code, equal_to(404))
+        assert_that([q["sql"] for q in queries if "django_flatpage" in q["sql"]], equal_to([]))
+
+    def test_get_without_slash_redirects(self):
+        response = self.client.get("/about")
+        self.assertRedirects(response, "/about/", status_code=301)
+
+    def test_get_with_matching_etag_returns_not_modified(self):
+        etag = self.client.get("/about/")["ETag"]
+        response = self.client.get("/about/", HTTP_IF_NONE_MATCH=etag)
+        assert_that(response.status_code, equal_to(304))
+
+    def test_etag_changes_with_url(self):
+        page = FlatPage.objects.create(url="/contact/", title="Contact", content="Get in touch")
+        page.sites.add(Site.objects.get_current())
+        etag = self.client.get("/about/")["ETag"]
+        assert_that(self.client.get("/contact/")["ETag"], is_not(equal_to(etag)))
+
+    def test_get_rerenders_after_flatpage_changes(self):
+        etag = self.client.get("/about/")["ETag"]
+        self.about.content = "All about Renter Haven"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.about.save()
+        response = self.client.get("/about/")
+        assert_that(response.content.decode(), contains_string("All about Renter Haven"))
+        assert_that(response["ETag"], is_not(equal_to(etag)))
+
+    def test_new_flatpage_is_found(self):
+        self.client.get("/about/")
+        with self.captureOnCommitCallbacks(execute=True):
+            page = FlatPage.objects.create(url="/contact/", title="Contact", content="Get in touch")
+            page.sites.add(Site.objects.get_current())
+        assert_that(self.client.get("/contact/").status_code, equal_to(200))
+
+    def test_registration_required_flatpage_is_not_cached(self):
+        response = self.client.get("/private/")
+        assert_that(response.status_code, equal_to(302))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/private/")
+        assert_that(len(queries), is_not(equal_to(0)))
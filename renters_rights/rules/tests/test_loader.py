@@ -0,0 +1,235 @@
+import os
+import tempfile
+from io import StringIO
+
+import yaml
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from hamcrest import assert_that, contains_exactly, contains_string, empty, equal_to
+
+from rules.catalog import get_catalog
+from rules.loader import get_fixture_paths, load_rules
+from rules.models import Ordinance, Rule, RuleGroup
+from rules.tests import RulesBaseTestCase
+
+
+class LoadRulesTests(TestCase):
+    def test_loads_the_same_content_as_loaddata(self):
+        call_command("loaddata", *get_fixture_paths(), verbosity=0)
+        expected = self.dump()
+        Rule.objects.all().delete()
+        RuleGroup.objects.all().delete()
+        Ordinance.objects.all().delete()
+
+        load_rules()
+
+        assert_that(self.dump(), equal_to(expected))
+
+    def test_loading_twice_updates_in_place(self):
+        load_rules()
+        pks = set(Rule.objects.values_list("pk", flat=True))
+        load_rules()
+        assert_that(set(Rule.objects.values_list("pk", flat=True)), equal_to(pks))
+
+    def test_command_reports_counts(self):
+        stdout = StringIO()
+        call_command("load_rules", stdout=stdout)
+        assert_that(stdout.getvalue(), contains_string("rules.rule: 41 created, 0 updated, 0 deleted, 0 unchanged"))
+        assert_that(stdout.getvalue(), contains_string("Loaded rules in"))
+
+    def test_sync_skips_unchanged_objects(self):
+        load_rules()
+        modified_at = dict(Rule.objects.values_list("slug", "modified_at"))
+
+        with CaptureQueriesContext(connection) as queries:
+            results = load_rules(sync=True)
+
+        assert_that([q["sql"] for q in queries if not q["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE"))], empty())
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 0 updated, 0 deleted, 41 unchanged"))
+        assert_that(dict(Rule.objects.values_list("slug", "modified_at")), equal_to(modified_at))
+
+    @staticmethod
+    def dump():
+        def rows(model):
+            fields = [
+                f.attname
+                for f in model._meta.concrete_fields
+                if f.attname not in ("id", "created_at", "modified_at", "content_hash", "source_fixture")
+            ]
+            return sorted(model.objects.values_list(*fields))
+
+        return {
+            "ordinances": rows(Ordinance),
+            "groups": rows(RuleGroup),
+            "rules": [
+                (r.slug, r.rule_group.slug, r.title_en, r.title_es, sorted(o.slug for o in r.ordinance.all()))
+                for r in Rule.objects.order_by("slug")
+            ],
+        }
+
+
+class LoadRulesIntoExistingContentTests(RulesBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        fixture_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(fixture_dir.cleanup)
+        self.fixture_dir = fixture_dir.name
+
+    def load(self, fixture, sync=False, name="rules.yaml"):
+        path = os.path.join(self.fixture_dir, name)
+        with open(path, "w") as fixture_file:
+            yaml.dump(fixture, fixture_file, allow_unicode=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            return load_rules([path], sync=sync)
+
+    def test_upserts_by_slug_and_replaces_ordinance_links(self):
+        get_catalog("en")
+        self.load(
+            [
+                self.ordinance_fixture()[1],
+                {"model": "rules.rulegroup", "pk": 100, "fields": {"title": "Kitchen", "slug": "kitchen"}},
+                {
+                    "model": "rules.rule",
+                    "pk": 100,
+                    "fields": {"title_en": "A sink", "slug": "sink", "rule_group": 100, "ordinance": [2]},
+                },
+            ]
+        )
+
+        sink = Rule.objects.get(slug="sink")
+        assert_that(sink.pk, equal_to(self.sink.pk))
+        assert_that(sink.title_en, equal_to("A sink"))
+        assert_that(list(sink.ordinance.all()), contains_exactly(self.toilet_rooms))
+        assert_that(RuleGroup.objects.count(), equal_to(2))
+        assert_that(get_catalog("en").groups[1].rules[0].title, equal_to("A sink"))
+
+    def test_sync_only_writes_changed_objects(self):
+        self.load(self.fixture())
+        modified_at = dict(Rule.objects.values_list("slug", "modified_at"))
+
+        fixture = self.fixture()
+        fixture[5]["fields"]["title_en"] = "A toilet that flushes every time"
+        results = self.load(fixture, sync=True)
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 1 updated, 0 deleted, 1 unchanged"))
+        assert_that(str(results["rules.rulegroup"]), equal_to("0 created, 0 updated, 0 deleted, 2 unchanged"))
+        assert_that(Rule.objects.get(slug="sink").modified_at, equal_to(modified_at["sink"]))
+        assert_that(Rule.objects.get(slug="toilet-flushes").title_en, equal_to("A toilet that flushes every time"))
+
+    def test_sync_treats_changed_ordinance_links_as_changes(self):
+        self.load(self.fixture())
+        fixture = self.fixture()
+        fixture[4]["fields"]["ordinance"] = [1, 2]
+        results = self.load(fixture, sync=True)
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 1 updated, 0 deleted, 1 unchanged"))
+        assert_that(
+            list(Rule.objects.get(slug="sink").ordinance.order_by("pk")), contains_exactly(self.plumbing, self.toilet_rooms)
+        )
+        assert_that(
+            list(Rule.objects.get(slug="toilet-flushes").ordinance.order_by("pk")),
+            contains_exactly(self.plumbing, self.toilet_rooms),
+        )
+
+    def test_sync_deletes_objects_no_longer_in_fixtures(self):
+        self.load(self.fixture())
+        admin_rule = Rule.objects.create(title_en="A rule from the admin", slug="admin-rule", rule_group=self.kitchen)
+
+        results = self.load(self.fixture()[:5], sync=True)
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 0 updated, 1 deleted, 1 unchanged"))
+        assert_that(Rule.objects.filter(slug="toilet-flushes").exists(), equal_to(False))
+        assert_that(Rule.objects.filter(pk=admin_rule.pk).exists(), equal_to(True))
+
+    def test_sync_only_deletes_objects_from_the_fixture_files_being_loaded(self):
+        self.load(self.fixture())
+        self.load(
+            [
+                {"model": "rules.rulegroup", "pk": 1, "fields": {"title": "Bedroom", "slug": "bedroom"}},
+                {"model": "rules.rule", "pk": 1, "fields": {"title_en": "A window", "slug": "window", "rule_group": 1}},
+            ],
+            name="bedroom.yaml",
+        )
+
+        results = self.load(self.fixture()[:2] + self.fixture()[3:4] + self.fixture()[5:], sync=True)
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 0 updated, 1 deleted, 1 unchanged"))
+        assert_that(str(results["rules.rulegroup"]), equal_to("0 created, 0 updated, 1 deleted, 1 unchanged"))
+        assert_that(Rule.objects.filter(slug="sink").exists(), equal_to(False))
+        assert_that(Rule.objects.filter(slug="window").exists(), equal_to(True))
+        assert_that(RuleGroup.objects.filter(slug="bedroom").exists(), equal_to(True))
+
+    def test_sync_keeps_rule_groups_that_still_have_other_rules(self):
+        self.load(self.fixture())
+        admin_rule = Rule.objects.create(title_en="A rule from the admin", slug="admin-rule", rule_group=self.kitchen)
+
+        results = self.load(self.fixture()[:2] + self.fixture()[3:4] + self.fixture()[5:], sync=True)
+
+        assert_that(str(results["rules.rule"]), equal_to("0 created, 0 updated, 1 deleted, 1 unchanged"))
+        assert_that(
+            str(results["rules.rulegroup"]),
+            equal_to("0 created, 0 updated, 0 deleted, 1 unchanged, 1 kept because other rules still use them"),
+        )
+        assert_that(Rule.objects.filter(pk=admin_rule.pk).exists(), equal_to(True))
+        assert_that(RuleGroup.objects.filter(pk=self.kitchen.pk).exists(), equal_to(True))
+
+    def test_references_are_resolved_against_the_fixtures_only(self):
+        # The fixture's ordinance 1 is the database's toilet_rooms ordinance, whatever the database's pk 1 is.
+        fixture = self.fixture()
+        fixture[0], fixture[1] = {**fixture[1], "pk": 1}, {**fixture[0], "pk": 2}
+        self.load(fixture)
+        assert_that(list(Rule.objects.get(slug="sink").ordinance.all()), contains_exactly(self.toilet_rooms))
+
+    def test_unknown_references_are_rejected(self):
+        fixture = self.fixture()
+        fixture[4]["fields"]["ordinance"] = [1, 3]
+        with self.assertRaisesMessage(ValueError, "Rule sink in rules.yaml refers to ordinance 3, which isn't in the"):
+            self.load(fixture)
+        with self.assertRaisesMessage(ValueError, "Rule toilet-flushes in rules.yaml refers to rule group 2, which"):
+            self.load(self.fixture()[:3] + self.fixture()[5:])
+        assert_that(Rule.objects.get(slug="sink").ordinance.count(), equal_to(1))
+
+    def ordinance_fixture(self):
+        def fields(ordinance):
+            return {
+                "ordinance": ordinance.ordinance,
+                "slug": ordinance.slug,
+                "title": ordinance.title,
+                "legal_description_en": ordinance.legal_description_en,
+                "legal_description_es": ordinance.legal_description_es,
+                "url": ordinance.url,
+            }
+
+        return [
+            {"model": "rules.ordinance", "pk": 1, "fields": fields(self.plumbing)},
+            {"model": "rules.ordinance", "pk": 2, "fields": fields(self.toilet_rooms)},
+        ]
+
+    def fixture(self):
+        return self.ordinance_fixture() + [
+            {"model": "rules.rulegroup", "pk": 1, "fields": {"title": "Kitchen", "slug": "kitchen"}},
+            {"model": "rules.rulegroup", "pk": 2, "fields": {"title": "Bathroom", "slug": "bathroom"}},
+            {
+                "model": "rules.rule",
+                "pk": 1,
+                "fields": {
+                    "title_en": "A working kitchen sink",
+                    "slug": "sink",
+                    "rule_group": 1,
+                    "ordinance": [1],
+                },
+            },
+            {
+                "model": "rules.rule",
+                "pk": 2,
+                "fields": {
+                    "title_en": "A toilet that flushes",
+                    "slug": "toilet-flushes",
+                    "rule_group": 2,
+                    "ordinance": [1, 2],
+                },
+            },
+        ]
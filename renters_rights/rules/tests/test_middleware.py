@@ -0,0 +1,56 @@
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import RequestFactory, SimpleTestCase
+from hamcrest import assert_that, equal_to, has_key, is_not
+
+from rules.middleware import TURBOLINKS_REDIRECT_COOKIE, TurbolinksMiddleware
+
+
+class TurbolinksMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _get(self, response, cookies=None, turbolinks=True):
+        request = self.factory.get("/", **({"HTTP_TURBOLINKS_REFERRER": "/"} if turbolinks else {}))
+        request.COOKIES.update(cookies or {})
+        # The requests have no session, so any attempt to use one fails the test.
+        return TurbolinksMiddleware(lambda r: response)(request)
+
+    def test_redirect_sets_signed_cookie(self):
+        response = self._get(HttpResponseRedirect("/rules"))
+        assert_that(response.cookies, has_key(TURBOLINKS_REDIRECT_COOKIE))
+        assert_that(response.cookies[TURBOLINKS_REDIRECT_COOKIE].value, is_not(equal_to("/rules")))
+
+    def test_redirected_visit_sends_location_and_clears_cookie(self):
+        cookie = self._get(HttpResponseRedirect("/rules")).cookies[TURBOLINKS_REDIRECT_COOKIE].value
+        response = self._get(HttpResponse(), {TURBOLINKS_REDIRECT_COOKIE: cookie})
+        assert_that(response["Turbolinks-Location"], equal_to("/rules"))
+        assert_that(response.cookies[TURBOLINKS_REDIRECT_COOKIE]["max-age"], equal_to(0))
+
+    def test_relative_subsequent_redirect_is_resolved(self):
+        cookie = self._get(HttpResponseRedirect("/rules/?a=b")).cookies[TURBOLINKS_REDIRECT_COOKIE].value
+        response = self._get(HttpResponseRedirect("./sink"), {TURBOLINKS_REDIRECT_COOKIE: cookie})
+        cookie = response.cookies[TURBOLINKS_REDIRECT_COOKIE].value
+        response = self._get(HttpResponse(), {TURBOLINKS_REDIRECT_COOKIE: cookie})
+        assert_that(response["Turbolinks-Location"], equal_to("/rules/./sink"))
+
+    def test_tampered_cookie_is_ignored(self):
+        response = self._get(HttpResponse(), {TURBOLINKS_REDIRECT_COOKIE: "http://evil.example.com"})
+        assert_that(response.has_header("Turbolinks-Location"), equal_to(False))
+
+    def test_ordinary_visit_sets_no_cookies(self):
+        response = self._get(HttpResponse())
+        assert_that(response.has_header("Turbolinks-Location"), equal_to(False))
+        assert_that(len(response.cookies), equal_to(0))
+
+    def test_non_turbolinks_redirect_is_ignored(self):
+        response = self._get(HttpResponseRedirect("/rules"), turbolinks=False)
+        assert_that(len(response.cookies), equal_to(0))
+
+    def test_async_redirect_sets_signed_cookie(self):
+        async def get_response(request):
+            return HttpResponseRedirect("/rules")
+
+        middleware = TurbolinksMiddleware(get_response)
+        response = async_to_sync(middleware)(self.factory.get("/", HTTP_TURBOLINKS_REFERRER="/"))
+        assert_that(response.cookies, has_key(TURBOLINKS_REDIRECT_COOKIE))
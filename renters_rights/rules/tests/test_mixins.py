@@ -0,0 +1,73 @@
+import mock
+from django.conf import settings
+from django.urls import reverse
+from django.utils.http import http_date
+from hamcrest import assert_that, contains_string, equal_to, is_not
+
+from lib.db import route_request
+from rules.tests import RulesBaseTestCase
+
+
+class CachedPageMixinTests(RulesBaseTestCase):
+    view_url = reverse("rule", args=["toilet-flushes"])
+
+    def test_get_sets_etag_and_last_modified(self):
+        response = self.client.get(self.view_url)
+        assert_that(response.has_header("ETag"), equal_to(True))
+        assert_that(response["Last-Modified"], equal_to(http_date(self.toilet.modified_at.timestamp())))
+        assert_that(response["Vary"], contains_string("Cookie"))
+
+    def test_get_serves_cached_page_without_queries(self):
+        first = self.client.get(self.view_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.view_url)
+        assert_that(second.content, equal_to(first.content))
+
+    @mock.patch("lib.db.replica_available", return_value=True)
+    @mock.patch("lib.db.connections", {"default": mock.Mock(in_atomic_block=False)})
+    def test_cached_pages_are_rendered_from_the_primary(self, _):
+        # There's no replica database in the tests, so any read routed to it would fail. The router sends reads inside
+        # transactions to the primary, so it mustn't see the test's transaction.
+        with route_request():
+            assert_that(self.client.get(self.view_url).status_code, equal_to(200))
+            assert_that(self.client.get(reverse("rules")).status_code, equal_to(200))
+
+    def test_get_with_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.view_url)["ETag"]
+        response = self.client.get(self.view_url, HTTP_IF_NONE_MATCH=etag)
+        assert_that(response.status_code, equal_to(304))
+
+    def test_get_with_current_last_modified_returns_not_modified(self):
+        last_modified = self.client.get(self.view_url)["Last-Modified"]
+        response = self.client.get(self.view_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert_that(response.status_code, equal_to(304))
+
+    def test_missing_page_is_never_not_modified(self):
+        last_modified = self.client.get(self.view_url)["Last-Modified"]
+        response = self.client.get(reverse("rule", args=["no-such-rule"]), HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert_that(response.status_code, equal_to(404))
+
+    def test_etag_changes_with_path(self):
+        etag = self.client.get(self.view_url)["ETag"]
+        assert_that(self.client.get(reverse("rules"))["ETag"], is_not(equal_to(etag)))
+
+    def test_etag_changes_with_language(self):
+        etag = self.client.get(self.view_url)["ETag"]
+        self.client.cookies[settings.LANGUAGE_COOKIE_NAME] = "es"
+        assert_that(self.client.get(self.view_url)["ETag"], is_not(equal_to(etag)))
+
+    def test_etag_changes_when_content_changes(self):
+        etag = self.client.get(self.view_url)["ETag"]
+        self.toilet.title_en = "A toilet that flushes properly"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.toilet.save()
+        response = self.client.get(self.view_url, HTTP_IF_NONE_MATCH=etag)
+        assert_that(response.status_code, equal_to(200))
+        self.assertContains(response, "A toilet that flushes properly")
+
+    def test_get_with_session_is_not_cached(self):
+        self.client.get(self.view_url)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = "session"
+        with self.assertNumQueries(2):
+            response = self.client.get(self.view_url)
+        assert_that(response.has_header("ETag"), equal_to(False))
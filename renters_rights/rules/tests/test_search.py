@@ -0,0 +1,56 @@
+from django.urls import reverse
+from hamcrest import assert_that, contains_exactly, empty
+
+from rules.search import search_rules
+from rules.tests import RulesBaseTestCase
+
+
+class SearchRulesTests(RulesBaseTestCase):
+    def test_finds_rules_by_title(self):
+        assert_that(list(search_rules("flushing toilet", "en")), contains_exactly(self.toilet))
+
+    def test_finds_rules_by_ordinance_legal_description(self):
+        assert_that(list(search_rules("privacy", "en")), contains_exactly(self.toilet))
+
+    def test_ranks_title_matches_above_legal_description_matches(self):
+        assert_that(list(search_rules("plumbing toilet or plumbing", "en")), contains_exactly(self.toilet, self.sink))
+
+    def test_searches_translated_text_with_language_configuration(self):
+        assert_that(list(search_rules("fregaderos", "es")), contains_exactly(self.sink))
+        assert_that(list(search_rules("fregaderos", "en")), empty())
+
+    def test_untranslated_text_falls_back_to_english(self):
+        assert_that(list(search_rules("toilet", "es")), contains_exactly(self.toilet))
+
+    def test_search_vectors_follow_rule_changes(self):
+        self.sink.plain_description_en = "Hot and cold running water"
+        self.sink.save()
+        assert_that(list(search_rules("running water", "en")), contains_exactly(self.sink))
+
+    def test_search_vectors_follow_ordinance_changes(self):
+        self.plumbing.legal_description_en = "Fixtures shall be free from leaks."
+        self.plumbing.save()
+        assert_that(list(search_rules("leaks", "en")), contains_exactly(self.sink, self.toilet))
+
+    def test_search_vectors_follow_ordinance_links(self):
+        self.sink.ordinance.add(self.toilet_rooms)
+        assert_that(list(search_rules("privacy", "en")), contains_exactly(self.sink, self.toilet))
+        self.toilet_rooms.rule_set.clear()
+        assert_that(list(search_rules("privacy", "en")), empty())
+
+
+class SearchViewTests(RulesBaseTestCase):
+    view_url = reverse("search")
+
+    def test_get_lists_matching_rules(self):
+        response = self.client.get(self.view_url, {"q": "sink"})
+        self.assertContains(response, '<a href="/rules/sink"', count=1)
+        self.assertNotContains(response, '<a href="/rules/toilet-flushes"')
+
+    def test_get_without_matches_says_so(self):
+        response = self.client.get(self.view_url, {"q": "elevator"})
+        self.assertContains(response, 'No rules matched "elevator".')
+
+    def test_get_without_query_does_not_search(self):
+        with self.assertNumQueries(0):
+            self.client.get(self.view_url)
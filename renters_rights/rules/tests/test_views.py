@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from rules.cache import get_content_last_modified
+from rules.tests import RulesBaseTestCase
+
+
+class RulesViewTests(RulesBaseTestCase):
+    view_url = reverse("rules")
+
+    def test_get_lists_rules_by_group(self):
+        response = self.client.get(self.view_url)
+        self.assertContains(response, "Bathroom")
+        self.assertContains(response, '<a href="/rules/sink"', count=1)
+        self.assertContains(response, "A working kitchen sink")
+
+    def test_get_renders_from_the_catalog_without_queries(self):
+        self.client.get(self.view_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.view_url)
+
+    def test_get_does_not_create_a_session(self):
+        response = self.client.get(self.view_url)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_get_caches_rule_list_per_language(self):
+        self.client.get(self.view_url)
+        self.client.cookies[settings.LANGUAGE_COOKIE_NAME] = "es"
+        response = self.client.get(self.view_url)
+        self.assertContains(response, "Un fregadero que funcione")
+        self.assertNotContains(response, "A working kitchen sink")
+
+    def test_get_rerenders_rule_list_after_a_rule_changes(self):
+        self.client.get(self.view_url)
+        self.sink.title_en = "A kitchen sink with hot and cold water"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sink.save()
+        response = self.client.get(self.view_url)
+        self.assertContains(response, "A kitchen sink with hot and cold water")
+
+
+class RuleViewTests(RulesBaseTestCase):
+    def test_get_shows_rule_with_its_ordinances(self):
+        response = self.client.get(reverse("rule", args=[self.toilet.slug]))
+        self.assertContains(
+            response, "Louisville statutes: § 156.153 - PLUMBING SYSTEMS AND FIXTURES, § 156.152 - TOILET ROOMS"
+        )
+        self.assertContains(response, "Toilet rooms and bathrooms shall provide privacy.")
+
+    def test_get_loads_rule_and_ordinances_in_two_queries(self):
+        get_content_last_modified()
+        with self.assertNumQueries(2):
+            self.client.get(reverse("rule", args=[self.toilet.slug]))
+
+    def test_get_with_unknown_slug_returns_404(self):
+        response = self.client.get(reverse("rule", args=["no-such-rule"]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_get_shows_rule(self):
+        response = await self.async_client.get(reverse("rule", args=[self.toilet.slug]))
+        self.assertContains(response, "Toilet rooms and bathrooms shall provide privacy.")
+        response = await self.async_client.get(reverse("rule", args=[self.toilet.slug]))
+        self.assertEqual(response.status_code, 200)
+
+
+class CsrfTokenViewTests(RulesBaseTestCase):
+    def test_token_can_be_used_to_change_language(self):
+        client = Client(enforce_csrf_checks=True)
+        self.assertEqual(client.post(reverse("set_language"), {"language": "es"}).status_code, 403)
+
+        response = client.get(reverse("csrf-token"))
+        self.assertIn("no-cache", response["Cache-Control"])
+        token = response.json()["token"]
+        response = client.post(reverse("set_language"), {"language": "es", "csrfmiddlewaretoken": token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_cached_pages_have_no_token(self):
+        self.assertNotContains(self.client.get(reverse("rules")), "csrfmiddlewaretoken")
@@ -1,12 +1,15 @@
 from django.urls import path
 
 from .views import (
+    AutocompleteView,
+    CsrfTokenView,
     GetHelpView,
     HowItWorksView,
     IndexView,
     ResourcesView,
     RulesView,
     RuleView,
+    SearchView,
 )
 
 urlpatterns = [
@@ -16,4 +19,7 @@ urlpatterns = [
     path("resources", ResourcesView.as_view(), name="resources"),
     path("rules", RulesView.as_view(), name="rules"),
     path("rules/<slug:slug>", RuleView.as_view(), name="rule"),
+    path("search", SearchView.as_view(), name="search"),
+    path("search/autocomplete", AutocompleteView.as_view(), name="autocomplete"),
+    path("csrf-token", CsrfTokenView.as_view(), name="csrf-token"),
 ]
@@ -1,36 +1,83 @@
 from itertools import groupby
 
-from django.shortcuts import get_object_or_404, render
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import never_cache
 from django.views.generic import View
 
-from rules.models import Rule
+from rules.catalog import get_catalog
+from rules.mixins import CachedPageMixin
+from rules.models import Ordinance, Rule
+from rules.search import search_rules
 
+SEARCH_RESULTS_LIMIT = 25
+AUTOCOMPLETE_RESULTS_LIMIT = 10
 
-class IndexView(View):
-    def get(self, request):
-        return render(request, "index.html")
+# Templates can reach the database, for example through the logged in user, which can't be done from async code.
+render_async = sync_to_async(render)
 
 
-class HowItWorksView(View):
-    def get(self, request):
-        return render(request, "how-it-works.html")
+class IndexView(CachedPageMixin, View):
+    async def get(self, request):
+        return await render_async(request, "index.html")
 
 
-class GetHelpView(View):
-    def get(self, request):
-        return render(request, "get-help.html")
+class HowItWorksView(CachedPageMixin, View):
+    async def get(self, request):
+        return await render_async(request, "how-it-works.html")
+
+
+class GetHelpView(CachedPageMixin, View):
+    async def get(self, request):
+        return await render_async(request, "get-help.html")
+
+
+class ResourcesView(CachedPageMixin, View):
+    async def get(self, request):
+        return await render_async(request, "resources.html")
 
 
-class ResourcesView(View):
+class RulesView(CachedPageMixin, View):
+    async def get(self, request):
+        catalog = await sync_to_async(get_catalog)()
+        return await render_async(request, "rules.html", context={"catalog": catalog})
+
+
+class RuleView(CachedPageMixin, View):
+    async def get(self, request, slug):
+        # The template uses the ordinances several times, so fetch them once, in order, alongside the rule.
+        rules = Rule.objects.select_related("rule_group").prefetch_related(
+            Prefetch("ordinance", queryset=Ordinance.objects.order_by("pk"), to_attr="ordinances")
+        )
+        try:
+            rule = await rules.aget(slug=slug)
+        except Rule.DoesNotExist:
+            raise Http404("No Rule matches the given query.")
+        return await render_async(request, "rule.html", context={"rule": rule})
+
+
+@method_decorator(never_cache, name="dispatch")
+class CsrfTokenView(View):
+    """Gives forms on cached pages, which can't include a CSRF token of their own, a token to submit with."""
+
     def get(self, request):
-        return render(request, "resources.html")
+        return JsonResponse({"token": get_token(request)})
 
 
-class RulesView(View):
+class SearchView(View):
     def get(self, request):
-        return render(request, "rules.html", context={"rules": Rule.objects.all()})
+        query = request.GET.get("q", "").strip()
+        rules = search_rules(query)[:SEARCH_RESULTS_LIMIT] if query else []
+        return render(request, "search.html", context={"query": query, "rules": rules})
 
 
-class RuleView(View):
-    def get(self, request, slug):
-        return render(request, "rule.html", context={"rule": get_object_or_404(Rule, slug=slug)})
+class AutocompleteView(View):
+    def get(self, request):
+        rules = get_catalog().prefix_index.search(request.GET.get("q", ""), limit=AUTOCOMPLETE_RESULTS_LIMIT)
+        return JsonResponse(
+            {"results": [{"title": rule.title, "url": rule.url, "ordinances": rule.ordinances} for rule in rules]}
+        )